@@ -0,0 +1,139 @@
+import time
+import pickle
+import tracemalloc
+from random import randint
+
+from rationals import Rational
+from spacetime_numpy import compute_grids
+from spacetime_index import Space, GridSpace
+
+
+class LegacyRational():
+	# list backed Rational as it was before the compact representation,
+	# without the per instance atexit hook
+	def __init__(self, m: int, n: int, dim=1):
+		r = Rational(m, n, dim)
+		self.m = m
+		self.n = n
+		self.dim = dim
+		self.period = r.period
+		self.digits, self.reminders = r.getSequence()
+		self.positions = [r.getPosition(t) for t in range(self.period + 1)]
+
+
+def legacy_position(r: LegacyRational, t):
+	px = 0
+	py = 0
+	pz = 0
+	for _ in range(t // r.period):
+		x, y, z = r.positions[r.period]
+		px += x
+		py += y
+		pz += z
+	if t % r.period != 0:
+		x, y, z = r.positions[t % r.period]
+		px += x
+		py += y
+		pz += z
+	return px, py, pz
+
+
+def legacy_time(r: LegacyRational, t):
+	T = len(r.digits)
+	time = 0
+	for i in range(t):
+		if r.digits[i % T] != r.digits[(i + 1) % T]:
+			time += 1
+	return time
+
+
+def _run(rationals, max, get_position, get_time):
+	init_time = time.perf_counter()
+	for r in rationals:
+		for rt in range(max + 1):
+			get_position(r, rt)
+			get_time(r, rt)
+	return (time.perf_counter() - init_time) * 1.0e6 / len(rationals)
+
+
+def bench_positions(num_rationals=2000, cycles=3):
+	print('------- per rational cost of SpaceTime.add positions and times (usecs)')
+	print(f'{"dim":>5s}{"T":>5s}{"n":>12s}{"before":>12s}{"after":>12s}{"speedup":>10s}')
+	for dim, T in [(1, 16), (2, 10), (3, 8)]:
+		n = (2**dim)**T - 1
+		max = T * cycles
+		numerators = [randint(0, n) for _ in range(num_rationals)]
+		rationals = [Rational(m, n, dim) for m in numerators]
+		legacy = [LegacyRational(m, n, dim) for m in numerators]
+		for r, l in zip(rationals, legacy):
+			for rt in range(max + 1):
+				assert r.position(rt) == legacy_position(l, rt)
+				assert r.time(rt) == legacy_time(l, rt)
+		before = _run(legacy, max, legacy_position, legacy_time)
+		after = _run(rationals, max, lambda r, t: r.position(t), lambda r, t: r.time(t))
+		print(f'{dim:5d}{T:5d}{n:12d}{before:12.2f}{after:12.2f}{before / after:10.1f}')
+
+
+def _measure(cls, n, dim):
+	tracemalloc.start()
+	rationals = [cls(m, n, dim) for m in range(n + 1)]
+	size, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	pickled = len(pickle.dumps(rationals))
+	return size, pickled
+
+
+def bench_memory():
+	print('------- memory of the rational set of setRationalSet(n) (bytes per rational)')
+	print(f'{"dim":>5s}{"T":>5s}{"n":>12s}{"before":>12s}{"after":>12s}{"ratio":>8s}{"pickle before":>15s}{"pickle after":>15s}')
+	for dim, T in [(1, 16), (2, 8), (3, 5)]:
+		n = (2**dim)**T - 1
+		before, pickled_before = _measure(LegacyRational, n, dim)
+		after, pickled_after = _measure(Rational, n, dim)
+		num = n + 1
+		print(
+			f'{dim:5d}{T:5d}{n:12d}{before / num:12.1f}{after / num:12.1f}{before / after:8.1f}'
+			f'{pickled_before / num:15.1f}{pickled_after / num:15.1f}'
+		)
+
+
+def _measure_space(cls, grid, dim):
+	columns = grid.occupied()
+	tracemalloc.start()
+	base, _ = tracemalloc.get_traced_memory()
+	space = cls(grid.t, dim, 0, 0)
+	space.setCells(*columns)
+	size, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	# the arrays of a GridSpace, tracemalloc would also count the allocator
+	size = space.nbytes() if cls is GridSpace else size - base
+	init_time = time.perf_counter()
+	for _ in range(100):
+		space.getMaxTime()
+		space.countCells()
+	elapsed = (time.perf_counter() - init_time) * 1.0e4
+	return size, elapsed, space.countCells()
+
+
+def bench_spaces():
+	# a GridSpace has an entry for every cell of the space, the bytes of an
+	# occupied cell are those of the entries over the part of them occupied
+	print('------- bytes per occupied cell and getMaxTime + countCells time (usecs) of the last space')
+	print(f'{"dim":>5s}{"T":>5s}{"cells":>10s}{"occupied":>10s}{"Space":>12s}{"GridSpace":>12s}{"per entry":>10s}{"Space":>10s}{"GridSpace":>10s}')
+	for dim, T in [(1, 20), (2, 10), (3, 7)]:
+		n = (2**dim)**T - 1
+		grids, _, _ = compute_grids(n, dim, T, T * 2, False)
+		grid = grids[-1]
+		before, time_before, cells = _measure_space(Space, grid, dim)
+		after, time_after, _ = _measure_space(GridSpace, grid, dim)
+		size = (grid.t + 1)**dim
+		print(
+			f'{dim:5d}{T:5d}{cells:10d}{100.0 * cells / size:9.1f}%{before / cells:12.1f}{after / cells:12.1f}'
+			f'{after / size:10.1f}{time_before:10.2f}{time_after:10.2f}'
+		)
+
+
+if __name__ == '__main__':
+	bench_positions()
+	bench_memory()
+	bench_spaces()
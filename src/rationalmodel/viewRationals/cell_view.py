@@ -0,0 +1,42 @@
+import numpy as np
+
+
+class CellView(object):
+	__slots__ = ('dim', 'x', 'y', 'z', 'count', 'time', 'next_digits', 'rationals')
+
+	def __init__(self, dim, x, y, z, count, time, next_digits, rationals=None):
+		self.dim = dim
+		self.x = x
+		self.y = y
+		self.z = z
+		self.count = count
+		self.time = time
+		self.next_digits = next_digits
+		self.rationals = rationals
+
+
+class CellsView(object):
+	# sequence of the occupied cells of a space stored as columns, the cells
+	# are only built when they are accessed, the positions are in half units
+	def __init__(self, dim, pos, count, time, next_digits, rationals=None):
+		self.dim = dim
+		self.pos = np.zeros((len(count), 3), dtype=np.int64)
+		self.pos[:, :pos.shape[1]] = pos
+		self.count = np.asarray(count)
+		self.time = np.asarray(time)
+		self.next_digits = np.asarray(next_digits)
+		self.rationals = rationals or {}
+
+	def __len__(self):
+		return len(self.count)
+
+	def __getitem__(self, i):
+		x, y, z = self.pos[i].tolist()
+		return CellView(
+			self.dim, x, y, z, int(self.count[i]), float(self.time[i]),
+			dict(enumerate(self.next_digits[i].tolist())), self.rationals.get(i)
+		)
+
+	def __iter__(self):
+		for i in range(len(self.count)):
+			yield self[i]
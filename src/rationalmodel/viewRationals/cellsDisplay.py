@@ -0,0 +1,342 @@
+from copy import copy
+from math import cos
+
+import numpy as np
+import moderngl as mgl
+from PIL import Image
+from madcad import settings, Box, fvec3, fvec4, fmat4, vec3, icosphere, icosahedron, cylinder, brick
+from madcad.mathutils import dot
+from madcad.mesh import Mesh, typedlist_to_numpy, connef
+from madcad.rendering import Display
+from madcad.common import ressourcedir
+
+
+cells_vertex_shader = '''
+#version 330
+
+in vec3 v_position;
+in vec3 v_normal;
+in vec3 i_position;
+in vec3 i_scale;
+in vec3 i_color;
+in int i_flags;
+uniform mat4 world;
+uniform mat4 view;
+uniform mat4 proj;
+uniform float side;
+uniform float front;
+uniform float reflectivity;
+
+out vec3 sight;
+out vec3 normal;
+flat out vec3 min_color;
+flat out vec3 max_color;
+flat out vec3 refl_color;
+flat out int flags;
+
+vec3 sight_direction(vec4 p) {
+	float f = proj[3][3] / dot(transpose(proj)[3], p) - 1;
+	return vec3(p) * vec3(f,f,-1);
+}
+
+void main() {
+	flags = i_flags;
+	min_color = i_color * side;
+	max_color = i_color * front;
+	refl_color = normalize(i_color + 1e-6) * reflectivity;
+
+	vec4 p = world * vec4(i_position + i_scale * v_position, 1);
+	sight = transpose(mat3(view)) * sight_direction(view*p);
+	// the unit mesh is scaled per axis, so are the normals inversely
+	normal = mat3(world) * (v_normal / max(i_scale, vec3(1e-6)));
+	gl_Position = proj * view * p;
+}
+'''
+
+cells_fragment_shader = '''
+#version 330
+
+in vec3 sight;
+in vec3 normal;
+flat in vec3 min_color;
+flat in vec3 max_color;
+flat in vec3 refl_color;
+flat in int flags;
+uniform vec3 select_color;
+uniform sampler2D reflectmap;
+
+out vec4 color;
+
+vec2 skybox(vec3 tosky) {
+	vec3 as = abs(tosky);
+	vec2 sky_coord;
+	if      (tosky.z>=  as.x && tosky.z>=  as.y)	sky_coord = vec2( tosky.y/as.z,   tosky.x/as.z)*0.15 + vec2(0.5, 0.4);
+	else if (tosky.y>=  as.x && tosky.y>=  as.z)	sky_coord = vec2(-tosky.z/as.y,   tosky.x/as.y)*0.15 + vec2(0.8, 0.4);
+	else if (tosky.x>=  as.y && tosky.x>=  as.z)	sky_coord = vec2( tosky.z/as.x,   tosky.y/as.x)*0.15 + vec2(0.8, 0.8);
+	else if (tosky.z<= -as.x && tosky.z<= -as.y)	sky_coord = vec2( tosky.x/as.z,   tosky.y/as.z)*0.15 + vec2(0.5, 0.8);
+	else if (tosky.y<= -as.x && tosky.y<= -as.z)	sky_coord = vec2( tosky.z/as.y,   tosky.x/as.y)*0.15 + vec2(0.2, 0.4);
+	else                                            sky_coord = vec2(-tosky.z/as.x,   tosky.y/as.x)*0.15 + vec2(0.2, 0.8);
+	return sky_coord;
+}
+
+void main() {
+	vec3 nsight = normalize(sight);
+	vec3 nnormal = normalize(normal);
+	float diffuse = max(0, dot(nsight, nnormal));
+	vec3 tosky = -reflect(nsight, nnormal);
+	vec3 refl = texture(reflectmap, skybox(tosky)).rgb;
+
+	color = vec4(refl * refl_color + mix(min_color, max_color, diffuse), 1);
+	if ((flags & 1) != 0)		color += vec4(select_color, 0) * min(1/max(0,(diffuse-0.1)), 10);
+}
+'''
+
+cells_lines_vertex_shader = '''
+#version 330
+
+in vec3 v_position;
+in vec3 i_position;
+in vec3 i_scale;
+in vec3 i_color;
+in int i_flags;
+uniform mat4 view;
+uniform mat4 proj;
+uniform float layer;
+uniform vec3 solid_color;
+uniform vec3 line_color;
+flat out vec3 color;
+flat out int flags;
+
+void main() {
+	flags = i_flags;
+	// same line color as the outlines of a madcad mesh with the cell color
+	color = (length(line_color) + dot(i_color - solid_color, line_color - solid_color)) * normalize(i_color + 1e-6);
+	gl_Position = proj * view * vec4(i_position + i_scale * v_position, 1);
+	if ((flags&1) != 0)	gl_Position[2] += 2*layer*gl_Position[3];
+	else				gl_Position[2] += layer*gl_Position[3];
+}
+'''
+
+cells_lines_fragment_shader = '''
+#version 330
+
+flat in vec3 color;
+flat in int flags;
+uniform vec4 select_color;
+out vec4 outcolor;
+
+void main() {
+	if ((flags & 1) != 0)		outcolor = select_color;
+	else						outcolor = vec4(color, 1);
+}
+'''
+
+cells_ident_shader = '''
+#version 330
+
+in vec3 v_position;
+in vec3 i_position;
+in vec3 i_scale;
+uniform mat4 view;
+uniform mat4 proj;
+uniform uint start_ident;
+flat out vec3 identcolor;
+
+void main() {
+	// one ident per instance, itemat() returns the instance as the sub index
+	uint ident = start_ident + uint(gl_InstanceID);
+	identcolor = vec3(float(ident % uint(256)), float(ident/uint(256)), 0)/255.;
+	gl_Position = proj * view * vec4(i_position + i_scale * v_position, 1);
+}
+'''
+
+
+def mesh_buffers(mesh: Mesh):
+    # same vertices and normals as the madcad display of the mesh
+    m = copy(mesh)
+    m.split(m.frontiers().edges)
+    edges = m.outlines().edges
+    tosplit = []
+    thresh = cos(settings.display['sharp_angle'])
+    conn = connef(m.faces)
+    for edge, f1 in conn.items():
+        if edge[1] > edge[0]:
+            continue
+        f2 = conn.get((edge[1], edge[0]))
+        if f2 is None:
+            continue
+        if m.tracks[f1] != m.tracks[f2] or dot(m.facenormal(f1), m.facenormal(f2)) <= thresh:
+            tosplit.append(edge)
+    m.split(tosplit)
+    return (
+        np.ascontiguousarray(typedlist_to_numpy(m.points, 'f4')),
+        np.ascontiguousarray(typedlist_to_numpy(m.vertexnormals(), 'f4')),
+        np.ascontiguousarray(typedlist_to_numpy(m.faces, 'u4')),
+        np.ascontiguousarray(typedlist_to_numpy(edges, 'u4'))
+    )
+
+
+# buffers of the unit meshes, built once per kind and subdivision level
+unit_meshes = {}
+
+
+def unit_mesh(kind, level=0):
+    # centered on the origin in the plane xz, with the height along y
+    key = (kind, level)
+    if key not in unit_meshes:
+        if kind == 'icosphere':
+            mesh = icosphere(vec3(0), 1, resolution=('div', level))
+        elif kind == 'icosahedron':
+            mesh = icosahedron(vec3(0), 1)
+        elif kind == 'cylinder':
+            mesh = cylinder(vec3(0), vec3(0, 1, 0), 1)
+        else:
+            mesh = brick(vec3(-0.5, 0, -0.5), vec3(0.5, 1, 0.5))
+        unit_meshes[key] = mesh_buffers(mesh)
+    return unit_meshes[key]
+
+
+class Cells:
+    # the cells of a slice sharing one unit mesh, each moved to its position and scaled per axis
+    def __init__(self, kind, level, positions, scales, colors) -> None:
+        self.kind = kind
+        self.level = level
+        self.positions = np.asarray(positions, dtype='f4').reshape(-1, 3)
+        self.scales = np.asarray(scales, dtype='f4').reshape(-1, 3)
+        self.colors = np.asarray(colors, dtype='f4').reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def display(self, scene):
+        return CellsDisplay(scene, self)
+
+
+class CellsDisplay(Display):
+    def __init__(self, scene, cells: Cells) -> None:
+        ctx = scene.ctx
+        points, normals, faces, lines = unit_mesh(cells.kind, cells.level)
+        self.options = scene.options
+        self.count = len(cells)
+        self.positions = cells.positions
+        self.flags = np.zeros(self.count, dtype='u1')
+        self.flags_updated = False
+        self.world = fmat4(1)
+        self.box = Box(
+            fvec3(*(cells.positions + cells.scales * points.min(axis=0)).min(axis=0)),
+            fvec3(*(cells.positions + cells.scales * points.max(axis=0)).max(axis=0))
+        )
+
+        def load(scene):
+            img = Image.open(ressourcedir + '/textures/' + settings.display['solid_reflect'])
+            return scene.ctx.texture(img.size, 3, img.tobytes())
+        self.reflectmap = scene.ressource('skybox', load)
+
+        def load(scene):
+            shader = scene.ctx.program(vertex_shader=cells_vertex_shader, fragment_shader=cells_fragment_shader)
+            shader['reflectmap'] = 0
+            return shader
+        self.shader = scene.ressource('shader_cells', load)
+
+        def load(scene):
+            return scene.ctx.program(
+                vertex_shader=cells_ident_shader,
+                fragment_shader=open(ressourcedir + '/shaders/ident.frag').read()
+            )
+        self.ident_shader = scene.ressource('shader_cells_ident', load)
+
+        def load(scene):
+            return scene.ctx.program(vertex_shader=cells_lines_vertex_shader, fragment_shader=cells_lines_fragment_shader)
+        self.lines_shader = scene.ressource('shader_cells_lines', load)
+
+        # the buffers of the unit mesh are shared by the displays of the scene
+        def load(scene):
+            return tuple(scene.ctx.buffer(array) if len(array) else None for array in (points, normals, faces, lines))
+        self.vb_points, self.vb_normals, self.vb_faces, self.vb_lines = \
+            scene.ressource(('cells_mesh', cells.kind, cells.level), load)
+        self.vb_positions = ctx.buffer(cells.positions)
+        self.vb_scales = ctx.buffer(cells.scales)
+        self.vb_colors = ctx.buffer(cells.colors)
+        self.vb_flags = ctx.buffer(self.flags, dynamic=True)
+        instances = [
+            (self.vb_positions, '3f/i', 'i_position'),
+            (self.vb_scales, '3f/i', 'i_scale'),
+            (self.vb_colors, '3f/i', 'i_color'),
+            (self.vb_flags, 'u1/i', 'i_flags')
+        ]
+        self.va = ctx.vertex_array(
+            self.shader,
+            [
+                (self.vb_points, '3f', 'v_position'),
+                (self.vb_normals, '3f', 'v_normal')
+            ] + instances,
+            self.vb_faces
+        )
+        # the outlines of the groups of the unit mesh, like the edges of the bricks
+        self.va_lines = ctx.vertex_array(
+            self.lines_shader, [(self.vb_points, '3f', 'v_position')] + instances, self.vb_lines
+        ) if self.vb_lines is not None else None
+        self.va_ident = ctx.vertex_array(
+            self.ident_shader,
+            [
+                (self.vb_points, '3f', 'v_position'),
+                (self.vb_positions, '3f/i', 'i_position'),
+                (self.vb_scales, '3f/i', 'i_scale')
+            ],
+            self.vb_faces
+        )
+
+    def __del__(self):
+        self.va.release()
+        self.va_ident.release()
+        if self.va_lines is not None:
+            self.va_lines.release()
+        for vb in (self.vb_positions, self.vb_scales, self.vb_colors, self.vb_flags):
+            vb.release()
+
+    def stack(self, scene):
+        yield ((), 'screen', -1, self.prerender)
+        yield ((), 'screen', 0, self.render)
+        yield ((), 'ident', 0, self.identify)
+        if self.options['display_groups'] and self.va_lines is not None:
+            yield ((), 'screen', 1, self.render_lines)
+
+    def center(self, index) -> vec3:
+        return vec3(fvec3(self.world * fvec4(*self.positions[index], 1)))
+
+    def select(self, index, state=None):
+        self.flags[index] = (not self.flags[index]) if state is None else state
+        self.flags_updated = True
+
+    def prerender(self, view):
+        if self.flags_updated:
+            self.vb_flags.write(self.flags)
+            self.flags_updated = False
+
+    def render(self, view):
+        s = settings.display
+        self.shader['select_color'].write(fvec3(s['select_color_face']))
+        self.shader['side'] = s['solid_color_side']
+        self.shader['front'] = s['solid_color_front']
+        self.shader['reflectivity'] = s['solid_reflectivity']
+        self.shader['world'].write(self.world)
+        self.shader['view'].write(view.uniforms['view'])
+        self.shader['proj'].write(view.uniforms['proj'])
+        self.reflectmap.use(0)
+        self.va.render(mgl.TRIANGLES, instances=self.count)
+
+    def render_lines(self, view):
+        s = settings.display
+        self.lines_shader['solid_color'].write(fvec3(s['solid_color']))
+        self.lines_shader['line_color'].write(fvec3(s['line_color']))
+        self.lines_shader['select_color'].write(fvec4(s['select_color_line'], 1))
+        self.lines_shader['layer'] = -2e-6
+        self.lines_shader['view'].write(view.uniforms['view'] * self.world)
+        self.lines_shader['proj'].write(view.uniforms['proj'])
+        self.va_lines.render(mgl.LINES, instances=self.count)
+
+    def identify(self, view):
+        self.ident_shader['start_ident'] = view.identstep(self.count)
+        self.ident_shader['view'].write(view.uniforms['view'] * self.world)
+        self.ident_shader['proj'].write(view.uniforms['proj'])
+        self.va_ident.render(mgl.TRIANGLES, instances=self.count)
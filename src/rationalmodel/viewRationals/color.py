@@ -1,5 +1,5 @@
+import numpy as np
 from madcad import vec3
-from madcad.mathutils import lerp
 
 
 class ColorKnot:
@@ -9,43 +9,52 @@ class ColorKnot:
 
 
 class ColorLine:
+    # entries of the lookup table of colors, rebuilt when the knots change
+    lut_size = 4096
+
     def __init__(self) -> None:
         self.knots: list[ColorKnot] = []
         self.normalized = False
+        self.lut = None
+        self.lut_knots = None
     
+    def __getstate__(self):
+        # the table is rebuilt by the processes that receive the line
+        state = self.__dict__.copy()
+        state['lut'] = None
+        state['lut_knots'] = None
+        return state
+
     def add(self, alpha: float, value) -> None:
         self.knots.append(ColorKnot(alpha, value))
         self.knots.sort(key=lambda x: x.alpha)
         self.normalized = False
 
-    @staticmethod
-    def _lerp(a, b, alpha: float):
-        r = lerp(a.x, b.x, alpha)
-        g = lerp(a.y, b.y, alpha)
-        b = lerp(a.z, b.z, alpha)
-        return vec3(r, g, b)
-
     def normalize(self) -> None:
         if not self.normalized:
             self.normalized = True
             for knot in self.knots:
                 knot.alpha = knot.alpha / self.knots[-1].alpha
 
-    def getColor(self, alpha: float):
+    def _interpolate(self, alphas):
+        knots = np.array([knot.alpha for knot in self.knots])
+        values = np.array([(knot.value.x, knot.value.y, knot.value.z) for knot in self.knots])
+        return np.stack([np.interp(alphas, knots, values[:, i]) for i in range(3)], axis=-1)
+
+    def getLut(self):
         self.normalize()
-        if alpha <= 0.0:
-            return self.knots[0].value
-        if alpha >= 1.0:
-            return self.knots[-1].value
-        for index in range(len(self.knots)):
-            if alpha <= self.knots[index].alpha:
-                alpha1 = self.knots[index - 1].alpha
-                alpha2 = self.knots[index].alpha
-                beta = (alpha - alpha1) / (alpha2 - alpha1)
-                color = self._lerp(
-                    self.knots[index - 1].value,
-                    self.knots[index].value,
-                    beta
-                )
-                return color
-        return vec3(1)
+        knots = [(knot.alpha, knot.value.x, knot.value.y, knot.value.z) for knot in self.knots]
+        if self.lut is None or knots != self.lut_knots:
+            self.lut = self._interpolate(np.linspace(0.0, 1.0, self.lut_size))
+            self.lut_knots = knots
+        return self.lut
+
+    def getColor(self, alpha: float):
+        r, g, b = self.getColors(alpha).tolist()
+        return vec3(r, g, b)
+
+    def getColors(self, alphas):
+        # the colors of an array of alphas, as the rows of a float array
+        lut = self.getLut()
+        index = np.rint(np.clip(alphas, 0.0, 1.0) * (self.lut_size - 1)).astype(np.intp)
+        return lut[index]
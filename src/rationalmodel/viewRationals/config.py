@@ -40,7 +40,10 @@ class Config:
             'list_color_not_period_prime': [1.0, 0.0, 1.0],
             'list_color_period_special': [0.0, 1.0, 1.0],
             'list_color_period_not_special': [0.0, 0.0, 1.0],
-            'max_octtree_levels': 4
+            'max_octtree_levels': 4,
+            'mapped_cache_slices': 8,
+            'cache_size_mb': 4096,
+            'lazy_slices': True
         }
         if os.path.exists(config_file):
             with open(config_file, 'rt') as fp:
@@ -1,13 +1,12 @@
-from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5 import QtCore, QtGui, QtWidgets, sip
 from PyQt5.QtGui import QMouseEvent, QWheelEvent, QKeyEvent
-from PIL import Image, ImageDraw
+from PIL import Image
 from madcad import vec3
 import numpy as np
 from multiprocessing import managers
 
 from config import config
 from color import ColorLine
-from utils import pil2pixmap
 from timing import timing
 from spacetime import SpaceTime
 
@@ -15,6 +14,21 @@ epsilon = 5.
 colors = [(100, 100, 100), (200, 100, 0), (150, 80, 0), (255, 255, 0)]
 
 
+def fill(buffer: np.ndarray, top: int, bottom: int, left: int, right: int, color):
+    # rows top..bottom-1 and columns left..right-1, clipped to the image
+    top, bottom = max(top, 0), min(bottom, buffer.shape[0])
+    left, right = max(left, 0), min(right, buffer.shape[1])
+    if top < bottom and left < right:
+        buffer[top:bottom, left:right, :3] = color
+
+
+def outline(buffer: np.ndarray, x0: int, y0: int, x1: int, y1: int, color):
+    fill(buffer, y0, y0 + 1, x0, x1 + 1, color)
+    fill(buffer, y1, y1 + 1, x0, x1 + 1, color)
+    fill(buffer, y0, y1 + 1, x0, x0 + 1, color)
+    fill(buffer, y0, y1 + 1, x1, x1 + 1, color)
+
+
 class Item:
     def __init__(self, x: int, height: int, color, count: int) -> None:
         self.x = x
@@ -44,13 +58,18 @@ class Scene:
         self.scl: float = 1.
         self.items: list[Item] = []
         self.select_area = None
+        self.arrays = None
+        self.buffer = None
+        self.image = None
 
     def clear(self):
         self.items = []
+        self.arrays = None
         self.max_x = 0.
         
     def add(self, x: int, height: int, color, count: int):
         self.items.append(Item(x, height, color, count))
+        self.arrays = None
         if x > self.max_x: self.max_x = x
 
     def scale(self, screen_x: float, mouse_step: float):
@@ -101,7 +120,23 @@ class Scene:
         x_max = x_step * int(np.power(x_base, 3))
         return int(x_step), int(x_max)
 
-    def _render_grid(self, draw: ImageDraw):
+    def _buffer(self):
+        # rgba image kept between renders, the QImage reads it without copy
+        if self.buffer is None or self.buffer.shape[:2] != (self.height, self.width):
+            self.buffer = np.empty((self.height, self.width, 4), dtype=np.uint8)
+            self.image = QtGui.QImage(sip.voidptr(self.buffer.ctypes.data), self.width, self.height, self.buffer.strides[0], QtGui.QImage.Format_RGBA8888)
+        return self.buffer
+
+    def _item_arrays(self):
+        if self.arrays is None:
+            self.arrays = (
+                np.array([item.x for item in self.items], dtype=np.float64),
+                np.array([item.height for item in self.items], dtype=np.float64),
+                np.clip(np.array([item.color for item in self.items], dtype=np.int64), 0, 255).astype(np.uint8).reshape(-1, 3),
+            )
+        return self.arrays
+
+    def _render_grid(self, buffer: np.ndarray, labels: list):
         x_base = 10
         y_base = 5
 
@@ -113,12 +148,16 @@ class Scene:
             if self._loga(y_base, y) >= 1 and color == colors[0]:
                 continue
             h = np.power(y / y_max, self.y_factor) * self.height
-            draw.line((0, self.height - h, self.width, self.height - h), color, 1)
+            row = int(self.height - h)
+            fill(buffer, row, row + 1, 0, self.width, color)
             if y % (5 * y_step) == 0:
-                draw.text((3, self.height - h), f'{y*4}', fill=color, size=12)
+                labels.append((3, self.height - h, f'{y*4}', color))
 
         x_step, x_max = self._get_x_step_max(x_base)
-        for x in range(-x_max, x_max, x_step):
+        # only the steps that fall on the screen
+        first = -x_max + max(0, int((self.screen2world(0) + x_max) // x_step)) * x_step
+        last = min(x_max, int(self.screen2world(self.width)) + x_step)
+        for x in range(first, last, x_step):
 
             color = colors[0]
             if x == 0: color = colors[3]
@@ -129,27 +168,57 @@ class Scene:
             if px < 0 or px > self.width: 
                 continue
             w = 1 if np.abs(px) > 0.1 else 3
-            draw.line((px, self.height, px, 0), color, w)
+            fill(buffer, 0, self.height, px - w // 2, px + w // 2 + 1, color)
             if abs(x_max - x) % ( 5 * x_step) == 0:
-                draw.text((px+4, 4), f'{x:,d}', fill=color, size=12)
-
-    def render(self):
-        img = Image.new('RGB', (self.width, self.height), self.background)
-        draw = ImageDraw.Draw(img)
+                labels.append((px+4, 4, f'{x:,d}', color))
+
+    def _render_labels(self, labels: list):
+        painter = QtGui.QPainter(self.image)
+        font = painter.font()
+        font.setPixelSize(10)
+        painter.setFont(font)
+        for x, y, text, color in labels:
+            painter.setPen(QtGui.QColor(*color))
+            painter.drawText(QtCore.QRectF(x, y, self.width, self.height), QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop, text)
+        painter.end()
+
+    def _render_items(self, buffer: np.ndarray):
+        if not self.items:
+            return
+        _, y_max = self._get_y_step_max(10)
+        x, height, color = self._item_arrays()
+        px = ((x + self.ox) * self.scl).astype(np.int64)
+        h = np.power(height / y_max, self.y_factor) * self.height
+        top = np.clip((self.height - h).astype(np.int64), 0, self.height)
+
+        # every bar is 3 pixels wide and goes down to the bottom, so a pixel shows
+        # the last item whose bar covers its column and starts above it
+        cols = px[:, None] + np.arange(-1, 2)
+        rows = np.broadcast_to(top[:, None], cols.shape)
+        order = np.broadcast_to(np.arange(len(px))[:, None], cols.shape)
+        inside = (cols >= 0) & (cols < self.width)
+        y0 = int(top.min())
+        last = np.full((self.height + 1 - y0, self.width), -1, dtype=np.int32)
+        np.maximum.at(last, (rows[inside] - y0, cols[inside]), order[inside])
+        last = np.maximum.accumulate(last[:-1], axis=0)
+        covered = last >= 0
+        buffer[y0:][covered, :3] = color[last[covered]]
+
+    def render(self) -> QtGui.QImage:
+        buffer = self._buffer()
+        buffer[...] = self.background + (255,)
 
         if self.select_area:
-            self.select_area.render(draw)
+            self.select_area.render(buffer)
 
-        self._render_grid(draw)
-        _, y_max = self._get_y_step_max(10)
-        for item in self.items:
-            x = int((item.x + self.ox) * self.scl)
-            h = np.power(item.height / y_max, self.y_factor) * self.height
-            draw.line((x, self.height - h, x, self.height), (item.color), 3)
+        labels = []
+        self._render_grid(buffer, labels)
+        self._render_labels(labels)
+        self._render_items(buffer)
+
+        outline(buffer, 0, 0, self.width - 1, self.height - 1, (255, 255, 255))
+        return self.image
 
-        draw.rectangle((0, 0, self.width-1, self.height-1), None, (255, 255, 255), 1)
-        return img
-    
     def itemat(self, x):
         x = self.screen2world(x)
         eps = epsilon / self.scl
@@ -185,7 +254,7 @@ class SelectArea:
     def set_end(self, end: int):
         self.end = end
 
-    def render(self, draw: ImageDraw.Draw):
+    def render(self, buffer: np.ndarray):
         colors = [(50, 50, 50), (50, 50, 200)]
         if self.begin == self.end:
             return
@@ -193,7 +262,8 @@ class SelectArea:
             t = self.end
             self.end = self.begin
             self.begin = t
-        draw.rectangle((self.begin, 0, self.end, self.scene.height), colors[0], colors[1], 1)
+        fill(buffer, 0, self.scene.height + 1, self.begin, self.end + 1, colors[0])
+        outline(buffer, self.begin, 0, self.end, self.scene.height, colors[1])
 
     def inside(self, xwrld: float):
         x = self.scene.world2screen(xwrld)
@@ -260,8 +330,7 @@ class Histogram(QtWidgets.QWidget):
         self.scene.clear()
 
     def reset(self):
-        img = self.scene.render()
-        self.label.setPixmap(pil2pixmap(img))
+        self.label.setPixmap(QtGui.QPixmap.fromImage(self.scene.render()))
         if self.isVisible():
             self.show()
             self.update()
@@ -282,30 +351,19 @@ class Histogram(QtWidgets.QWidget):
         if not self.spacetime:
             return
         
-        dict_objs = {}
-        view_cells = self.spacetime.getCells(self.time, self.accumulate)
-
-        max = -1
-        for cell in view_cells:
-            count = cell.count
-            if count > max:
-                max = count
-            if count not in dict_objs: dict_objs[count] = 0
-            dict_objs[count] += 1
+        # counts of the cells and how many cells have each, kept by the spacetime
+        counts, heights = self.spacetime.getHistogram(self.time, self.accumulate)
 
         self.scene.clear()
-        for count in dict_objs.keys():
-            alpha = float(count) / float(max)
-            pos = float(count)
+        if not len(counts):
+            return
+        colors = self.color.getColors(counts / float(counts[-1])).tolist()
+        for count, height, (r, g, b) in zip(counts.tolist(), heights.tolist(), colors):
             if self.parent() and self.parent().is_selected(count):
-                color = vec3(255, 255, 255)
+                color = vec3(1, 1, 1)
             else:
-                color = self.color.getColor(alpha)
-            height = float(dict_objs[count])
-            self.scene.add(pos, height, color, count)
-
-        del view_cells
-        del dict_objs
+                color = vec3(r, g, b)
+            self.scene.add(float(count), float(height), color, count)
 
     def prepare_save_image(self):
         self.old_time = self.time
@@ -315,8 +373,8 @@ class Histogram(QtWidgets.QWidget):
         self._make_items()
         if self.accumulate:
             self.scene.fit()
-        img = self.scene.render()
-        return img.convert('RGBA')
+        self.scene.render()
+        return Image.fromarray(self.scene.buffer.copy(), 'RGBA')
 
     def end_save_image(self):
         self.time = self.old_time
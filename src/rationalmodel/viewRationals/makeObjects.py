@@ -1,7 +1,8 @@
 import numpy as np
-import math
-from madcad import icosphere, icosahedron, brick, vec3, cylinder, cone, Box, Axis, X, Y, Z
+from madcad import vec3, cylinder, cone, Box, Axis, X, Y, Z
 from spacetime import Cell, c
+from cell_view import CellsView
+from cellsDisplay import Cells
 
 
 def _get_next_number_dir(dim, cell: Cell):
@@ -28,6 +29,28 @@ def _get_next_number_dir(dim, cell: Cell):
     return v * cell.count
 
 
+def _cell_columns(view_cells):
+    # positions, counts and times of the cells as arrays
+    if isinstance(view_cells, CellsView):
+        return view_cells.pos, view_cells.count, view_cells.time
+    pos = np.array([(cell.x, cell.y, cell.z) for cell in view_cells], dtype=np.int64).reshape(-1, 3)
+    counts = np.array([cell.count for cell in view_cells], dtype=np.int64)
+    times = np.array([cell.time for cell in view_cells], dtype=float)
+    return pos, counts, times
+
+
+def _add_cells(objs, cell_ids, num_id, kind, level, positions, scales, colors, counts):
+    objs[num_id] = Cells(kind, level, positions, scales, colors)
+    # a cell is selected by its display and instance
+    order = np.argsort(counts, kind='stable')
+    values, starts = np.unique(counts[order], return_index=True)
+    for count, indices in zip(values.tolist(), np.split(order, starts[1:])):
+        if count not in cell_ids:
+            cell_ids[count] = []
+        cell_ids[count].extend((num_id, index) for index in indices.tolist())
+    return num_id + 1
+
+
 def make_objects(spacetime, number, dim, accumulate, config, ccolor, view_objects, view_time, view_next_number, max_time, ptime):
     if not spacetime:
         return {}, 0, {}
@@ -49,68 +72,71 @@ def make_objects(spacetime, number, dim, accumulate, config, ccolor, view_object
     max_faces = config.get('max_faces')
     faces_pow = config.get('faces_pow')
 
-    total = 0
-    max = -1
-    count = 0
-    for cell in view_cells:
-        if cell.count > max:
-            max = cell.count
-        if cell.count > 0:
-            count += 1
-        total += cell.count
-
-    max_spaces_time = spacetime.getMaxTime(accumulate)
+    pos, counts, times = _cell_columns(view_cells)
+    xs, ys, zs = (c * pos.astype(float)).T
+    total = int(counts.sum())
+    max = int(counts.max()) if len(counts) else -1
+    count = int(np.count_nonzero(counts > 0))
+
+    # the max time needs every space, which a lazy spacetime may not have yet
+    max_spaces_time = spacetime.getMaxTime(accumulate) if view_time else 0.0
     
     num_id = 0
     objs = {}
     cell_ids = {}
-
-    if view_objects:
-        for cell in view_cells:
-            alpha = float(cell.count) / float(max)
-            rad = math.pow(alpha / rad_factor, rad_pow)
-            if rad < rad_min:
-                rad = rad_min
-            color = ccolor.getColor(alpha)
-
-            if dim == 3:
-                obj = icosphere(vec3(cell.x, cell.y, cell.z), rad, resolution=('div', int(max_faces * math.pow(rad, faces_pow))))
-            elif dim == 2:
-                obj = cylinder(vec3(cell.x, 0, cell.y), vec3(cell.x, alpha*10, cell.y), rad)
-            else:
-                height = 14 * float(cell.count) / float(total)
-                obj = brick(vec3(cell.x - c, 0, 0), vec3(cell.x + c, 1, height))
-            obj.option(color=color)
-            objs[num_id] = obj
-            if cell.count not in cell_ids:
-                cell_ids[cell.count] = []
-            cell_ids[cell.count].append(num_id)
-            num_id += 1
-
-    elif view_time:
-        for cell in view_cells:
-            if max_time == 0.0:
-                continue
-            alpha = float(cell.time) / float(max_spaces_time)
-            rad = math.pow(alpha / rad_factor, rad_pow)
-            if rad == 0:
-                continue
-            color = ccolor.getColor(alpha)
-
-            if dim == 3:
-                f = 4 * rad
-                obj = icosahedron(vec3(cell.x, cell.y, cell.z), f)
-            elif dim == 2:
-                obj = brick(vec3(cell.x - c, 0, cell.y - c), vec3(cell.x + c, alpha*10, cell.y + c))
+    zeros = np.zeros(len(counts))
+    ones = np.ones(len(counts))
+
+    if view_objects and len(counts):
+        alphas = counts / float(max)
+        rads = np.maximum(np.power(alphas / rad_factor, rad_pow), rad_min)
+        colors = ccolor.getColors(alphas)
+
+        if dim == 3:
+            positions = np.stack([xs, ys, zs], axis=-1)
+            scales = np.stack([rads, rads, rads], axis=-1)
+            # the cells of every subdivision level share one unit mesh
+            levels = (max_faces * np.power(rads, faces_pow)).astype(int)
+            for level in np.unique(levels).tolist():
+                cells = levels == level
+                num_id = _add_cells(
+                    objs, cell_ids, num_id, 'icosphere', level,
+                    positions[cells], scales[cells], colors[cells], counts[cells]
+                )
+        else:
+            if dim == 2:
+                kind = 'cylinder'
+                positions = np.stack([xs, zeros, ys], axis=-1)
+                scales = np.stack([rads, alphas*10, rads], axis=-1)
             else:
-                height = 14 * alpha
-                obj = brick(vec3(cell.x - c, 0, 0), vec3(cell.x + c, 1, height))
-            obj.option(color=color)
-            objs[num_id] = obj
-            if cell.count not in cell_ids:
-                cell_ids[cell.count] = []
-            cell_ids[cell.count].append(num_id)
-            num_id += 1
+                kind = 'brick'
+                heights = 14 * counts / float(total)
+                positions = np.stack([xs, zeros, 0.5 * heights], axis=-1)
+                scales = np.stack([2 * c * ones, ones, heights], axis=-1)
+            num_id = _add_cells(objs, cell_ids, num_id, kind, 0, positions, scales, colors, counts)
+
+    elif view_time and len(counts) and max_time != 0.0:
+        alphas = times / float(max_spaces_time)
+        rads = np.power(alphas / rad_factor, rad_pow)
+        cells = rads != 0
+        alphas, rads = alphas[cells], rads[cells]
+        xs, ys, zs, zeros, ones = xs[cells], ys[cells], zs[cells], zeros[cells], ones[cells]
+        colors = ccolor.getColors(alphas)
+
+        if dim == 3:
+            kind = 'icosahedron'
+            positions = np.stack([xs, ys, zs], axis=-1)
+            scales = np.stack([4 * rads, 4 * rads, 4 * rads], axis=-1)
+        elif dim == 2:
+            kind = 'brick'
+            positions = np.stack([xs, zeros, ys], axis=-1)
+            scales = np.stack([2 * c * ones, alphas*10, 2 * c * ones], axis=-1)
+        else:
+            kind = 'brick'
+            heights = 14 * alphas
+            positions = np.stack([xs, zeros, 0.5 * heights], axis=-1)
+            scales = np.stack([2 * c * ones, ones, heights], axis=-1)
+        num_id = _add_cells(objs, cell_ids, num_id, kind, 0, positions, scales, colors, counts[cells])
 
     if view_next_number: 
         min_dir = 1000000
@@ -134,14 +160,15 @@ def make_objects(spacetime, number, dim, accumulate, config, ccolor, view_object
                 continue
             dir = dir * k / mod_dir
             mod_dir = k
+            x, y, z = c * cell.x, c * cell.y, c * cell.z
 
-            base = vec3(cell.x, cell.y, cell.z)
+            base = vec3(x, y, z)
             dir_len = 5.0
             if dim == 1:
-                base = vec3(cell.x, 0.0, -1.0)
+                base = vec3(x, 0.0, -1.0)
                 dir_len = 3.0
             elif dim == 2:
-                base = vec3(cell.x, 0, cell.y)
+                base = vec3(x, 0, y)
 
             color = vec3(0.6, 0.8, 1.0)
 
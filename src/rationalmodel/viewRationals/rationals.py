@@ -1,24 +1,33 @@
 import numpy as np
-import atexit
+from array import array
 
+# positions are integer coordinates in half units, c is the size of the half
+# unit, every step moves a half unit towards the sign of the digit bit
 c = 0.5
 
 
 class Rational():
+    __slots__ = ('m', 'n', 'dim', 'period', 'table')
+
     def __init__(self, m: int, n: int, dim=1):
         self.m = m
         self.n = n
         self.dim = dim
         self.period =self.getPeriod()
 
-        self.digits: list = []
-        self.reminders: list = []
-        self.digits, self.reminders = self.getSequence()
-        self.positions = [self.getPosition(t) for t in range(self.period + 1)]
-        atexit.register(self.cleanup)
+        # digits, prefix sums of the one bits of every axis and prefix sums
+        # of the digit changes over one period, packed in a single array, the
+        # reminders are computed when they are asked for
+        digits, _ = self.getSequence()
+        self.table = self.getTable(digits)
+
+    @property
+    def digits(self) -> list:
+        return self.table[:self.period].tolist()
 
-    def cleanup(self):
-        del self.positions
+    @property
+    def reminders(self) -> list:
+        return [self.reminder(t) for t in range(self.period)]
 
     def getSequence(self):
         base = int(2**self.dim)
@@ -57,22 +66,43 @@ class Rational():
         return p
 
     def getPosition(self, t):
-        period = len(self.digits)
-        x = 0.0
-        y = 0.0
-        z = 0.0
+        digits = self.digits
+        period = len(digits)
+        x = 0
+        y = 0
+        z = 0
         for i in range(t):
-            digit = self.digits[i % period]
+            digit = digits[i % period]
             dx = (digit % 2)
-            x += c - dx
+            x += 1 - 2 * dx
             if self.dim > 1:
                 dy = (digit // 2) % 2
-                y += c - dy
+                y += 1 - 2 * dy
             if self.dim > 2:
                 dz = (digit // 4) % 2
-                z += c - dz
+                z += 1 - 2 * dz
         return (x, y, z)
 
+    def getTable(self, digits: list):
+        T = len(digits)
+        ones = [0] * self.dim
+        count = [0, 0, 0]
+        times = [0]
+        time = 0
+        for i in range(T):
+            digit = digits[i]
+            for axis in range(self.dim):
+                count[axis] += (digit >> axis) & 1
+                ones.append(count[axis])
+            if digit != digits[(i + 1) % T]:
+                time += 1
+            times.append(time)
+        # the widest values are the prefix sums, up to the period
+        for typecode in 'BHIQ':
+            if T < 1 << (8 * array(typecode).itemsize):
+                break
+        return array(typecode, digits + ones + times)
+
     def path(self):
         return ''.join([str(d) for d in self.digits])
 
@@ -80,36 +110,33 @@ class Rational():
         return self.reminders
     
     def reminder(self, t):
-        T = len(self.digits)
-        return self.reminders[t % T]
+        # the reminder t is m times base^t mod n, and m itself for m = n
+        if self.m == self.n:
+            return self.m
+        return self.m * pow(1 << self.dim, t % self.period, self.n) % self.n
 
     def position(self, t):
-        px = 0.0
-        py = 0.0
-        pz = 0.0
-        nt = t // self.period
-        for _ in range(nt):
-            x, y, z = self.positions[self.period]
-            px += x
-            py += y
-            pz += z
-        if t % self.period != 0:
-            x, y, z = self.positions[t % self.period]
-            px += x
-            py += y
-            pz += z
-        return px, py, pz
+        nt, rt = divmod(t, self.period)
+        table = self.table
+        dim = self.dim
+        period = self.period * (dim + 1)
+        rt = self.period + rt * dim
+        x = t - 2 * (nt * table[period] + table[rt])
+        if dim == 1:
+            return x, 0, 0
+        y = t - 2 * (nt * table[period + 1] + table[rt + 1])
+        if dim == 2:
+            return x, y, 0
+        z = t - 2 * (nt * table[period + 2] + table[rt + 2])
+        return x, y, z
 
     def digit(self, t):
-        return self.digits[t % self.period]
+        return self.table[t % self.period]
     
     def time(self, t):
-        T = len(self.digits)
-        time = 0
-        for i in range(t):
-            if self.digits[i % T] != self.digits[(i + 1) % T]:
-                time += 1
-        return time
+        nt, rt = divmod(t, self.period)
+        times = self.period * (self.dim + 1) + self.dim
+        return nt * self.table[times + self.period] + self.table[times + rt]
 
     def __str__(self) -> str:
         return f'({self.m} / {self.n})'
@@ -118,11 +145,13 @@ class Rational():
         return f'Rational({self.m}, {self.n}, {self.dim})'
     
     def __eq__(self, r) -> bool:
-        l = len(self.reminders)
+        reminders = self.reminders
+        other = r.reminders
+        l = len(reminders)
         for i in range(l):
             eq = True
             for j in range(l):
-                if self.reminders[(i + j) % l] != r.reminders[j]:
+                if reminders[(i + j) % l] != other[j]:
                     eq = False
                     break
             if eq == True:
@@ -132,6 +161,51 @@ class Rational():
     def __neq__(self, r) -> bool:
         return not self.__eq__(r)
 
+def orbit_leaders(n: int, dim=1, m0=0, m1=None):
+    # the reminders of m/n are the orbit of m under multiplication by the base
+    # mod n, every orbit is represented by its smallest member. Walks the orbit
+    # of every numerator in [m0, m1), less than n, for its representative and
+    # the steps from the numerator to it
+    base = 2**dim
+    period = Rational(1, n, dim).period
+    m = np.arange(m0, n if m1 is None else min(m1, n), dtype=np.int64)
+    reminder = m.copy()
+    first = m.copy()
+    steps = np.zeros_like(m)
+    for step in range(1, period):
+        reminder = reminder * base % n
+        smaller = reminder < first
+        first[smaller] = reminder[smaller]
+        steps[smaller] = step
+    return m, first, steps
+
+def orbits(n: int, dim=1, m0=0, m1=None):
+    # the representatives of the orbits among the numerators in [m0, m1)
+    m, first, _ = orbit_leaders(n, dim, m0, m1)
+    representatives = m[first == m]
+    if m1 is None or m1 > n:
+        representatives = np.append(representatives, n)
+    return representatives
+
+def orbit_chunks(n: int, dim=1, size=1 << 20):
+    for m0 in range(0, n + 1, size):
+        yield orbits(n, dim, m0, m0 + size)
+
+def orbit_members(n: int, dim=1, size=1 << 20):
+    # every numerator of [0, n] in order, as the representative of its orbit
+    # and its place in it. One Rational is built per orbit met in a chunk and
+    # dropped with it, so the state is bounded by the chunk size
+    for m0 in range(0, n + 1, size):
+        rationals = {}
+        for first, steps in zip(*[a.tolist() for a in orbit_leaders(n, dim, m0, m0 + size)[1:]]):
+            r = rationals.get(first)
+            if r is None:
+                r = rationals[first] = Rational(first, n, dim)
+            # the numerator is steps before its representative in the orbit
+            yield r, (r.period - steps) % r.period
+        if m0 + size > n:
+            yield Rational(n, n, dim), 0
+
 if __name__ == '__main__':
     dim = 1
     T = 10
@@ -2,7 +2,6 @@ import os
 import shutil
 import math
 import time
-from multiprocessing import Pool, cpu_count, Manager
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 from madcad import vec3, settings, Axis, X, Y, Z, Box, cylinder, brick, icosphere, cone
@@ -11,6 +10,7 @@ from views import ViewRender
 from makeObjects import make_objects
 from utils import make_video, collect
 from timing import timing
+from session import EngineSession
 
 settings_file = r'settings.txt'
 
@@ -159,7 +159,7 @@ def _create_video(args):
 
 
 @timing
-def _saveImages(args):
+def _saveImages(args, session: EngineSession):
 
     shr_projection, shr_navigation, image_path, init_time, end_time, \
     subfolder, prefix, suffix, num_frames, turn_angle, config, \
@@ -221,11 +221,11 @@ def _saveImages(args):
         shr_num_video_frames
     ) if not single_image else ()
 
-    num_cpus = int(cpu_count() * 0.8)
+    num_cpus = session.processes
     chunksize = (range_frames // num_cpus) or 1
     print(f'------- range_frames: {range_frames}, num_cpus: {num_cpus}, chunksize: {chunksize}')
     
-    pool = Pool(num_cpus)
-    pool.imap(func=_create_image, iterable=params, chunksize=chunksize)
+    # the frames are rendered by the workers of the session, kept for the next export
+    result = session.pool().map_async(func=_create_image, iterable=params, chunksize=chunksize)
 
-    return (pool, args_video)
+    return (result, args_video)
@@ -1,6 +1,9 @@
 from madcad import rendering
 from PyQt5 import QtCore, QtWidgets
 
+from rationals import c
+from cellsDisplay import CellsDisplay
+
 
 class ScreenView(rendering.View):
     def __init__(
@@ -17,18 +20,28 @@ class ScreenView(rendering.View):
     def mouseClick(self, evt):
         obj = self.itemat(QtCore.QPoint(evt.x(), evt.y()))
         if obj:
-            center = self.scene.item(obj).box.center
+            disp = self.scene.item(obj)
+            if isinstance(disp, CellsDisplay):
+                center = disp.center(obj[-1])
+            else:
+                center = disp.box.center
             t = self.mainWindow.timeWidget.value()
             spacetime = self.mainWindow.spacetime
             if spacetime:
-                if self.mainWindow.dim == 2:
-                    x = center.x
-                    y = center.z
-                    z = 0.0
+                # the cells are at integer half unit coordinates
+                dim = self.mainWindow.dim
+                if dim == 1:
+                    x = round(center.x / c)
+                    y = 0
+                    z = 0
+                elif dim == 2:
+                    x = round(center.x / c)
+                    y = round(center.z / c)
+                    z = 0
                 else:
-                    x = center.x
-                    y = center.y
-                    z = center.z
+                    x = round(center.x / c)
+                    y = round(center.y / c)
+                    z = round(center.z / c)
                 cell = spacetime.getCell(t, x, y, z, accumulate=self.mainWindow._check_accumulate())
                 if not cell:
                     return False
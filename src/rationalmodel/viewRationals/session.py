@@ -0,0 +1,119 @@
+from multiprocessing import Pool, cpu_count, managers
+
+
+class SessionManager(managers.SyncManager):
+	# the modules register their shared classes on it
+	...
+
+
+class Workers(object):
+	# pool run by the manager of a shared session, so the objects held by the
+	# manager and the main process use the same workers
+	def __init__(self, processes):
+		self.processes = processes
+		self._pool = Pool(processes)
+
+	def imap(self, func, iterable, chunksize=1):
+		return self._pool.imap(func, iterable, chunksize)
+
+	def imap_unordered(self, func, iterable, chunksize=1):
+		return self._pool.imap_unordered(func, iterable, chunksize)
+
+	def map_async(self, func, iterable, chunksize=None):
+		return self._pool.map_async(func, iterable, chunksize)
+
+	def terminate(self):
+		# stops the running tasks and starts new workers in their place
+		self._pool.terminate()
+		self._pool.join()
+		self._pool = Pool(self.processes)
+
+	def close(self):
+		self._pool.close()
+		self._pool.join()
+
+
+_workers = None
+
+
+def _session_workers(processes):
+	# a manager serves one session, so every session using it gets its pool
+	global _workers
+	if _workers is None:
+		_workers = Workers(processes)
+	return _workers
+
+
+SessionManager.register('Workers', _session_workers, method_to_typeid={
+	'imap': 'Iterator', 'imap_unordered': 'Iterator', 'map_async': 'AsyncResult'
+})
+
+
+class EngineSession(object):
+	# worker pool and manager kept alive between computations and exports,
+	# both are started on first use and stopped by shutdown. The pool of a
+	# shared session runs in its manager, and the session passed to an object
+	# of the manager uses that pool and manager instead of starting its own
+	def __init__(self, processes=0, shared=False):
+		self.processes = max(1, processes or cpu_count())
+		self.shared = shared
+		self._pool = None
+		self._manager = None
+		self._owner = True
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.shutdown()
+
+	def __del__(self):
+		self.shutdown()
+
+	def __getstate__(self):
+		# the workers and the manager belong to the process that started them
+		if not self.shared:
+			return {'processes': self.processes}
+		return {'processes': self.processes, 'address': self.manager().address}
+
+	def __setstate__(self, state):
+		self.__init__(state['processes'], 'address' in state)
+		if self.shared:
+			self._owner = False
+			self._manager = SessionManager(state['address'])
+			self._manager.connect()
+
+	def pool(self):
+		if self._pool is None:
+			self._pool = self.manager().Workers(self.processes) if self.shared else Pool(self.processes)
+		return self._pool
+
+	def manager(self) -> SessionManager:
+		if self._manager is None:
+			self._manager = SessionManager()
+			self._manager.start()
+		return self._manager
+
+	def terminate(self):
+		# stops the running tasks, the workers are started again in place or
+		# by the next pool()
+		if self._pool is None:
+			return
+		self._pool.terminate()
+		if not self.shared:
+			self._pool.join()
+			self._pool = None
+
+	def shutdown(self):
+		if not self._owner:
+			self._pool = None
+			self._manager = None
+			return
+		if self._pool is not None:
+			self._pool.close()
+			if not self.shared:
+				self._pool.join()
+			self._pool = None
+		if self._manager is not None:
+			self._manager.shutdown()
+			self._manager = None
@@ -321,9 +321,9 @@ def add_rational(args):
 	r: Rational = args[2]
 	for rt in range(0, max + 1):
 		px, py, pz = r.position(rt)
-		px += x
-		py += y
-		pz += z
+		px = c * px + x
+		py = c * py + y
+		pz = c * pz + z
 		reminders = r.reminders
 		digits = r.path()
 		m = r.m
@@ -369,9 +369,9 @@ class SpaceTime(object):
 	def add(self, r: Rational, t, x, y, z):
 		for rt in range(0, self.max + 1):
 			px, py, pz = r.position(rt)
-			px += x
-			py += y
-			pz += z
+			px = c * px + x
+			py = c * py + y
+			pz = c * pz + z
 			reminders = r.reminders
 			digits = r.path()
 			m = r.reminder(t+rt)
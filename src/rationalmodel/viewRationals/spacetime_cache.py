@@ -0,0 +1,62 @@
+import os
+import json
+import hashlib
+
+from spacetime_file import extension
+from spacetime_numpy import engine_version
+
+
+class SpaceTimeCache(object):
+	# computed spacetimes saved as binary files named by the hash of their
+	# parameters, the least recently used are removed beyond max_size bytes
+	def __init__(self, path, max_size):
+		self.path = path
+		self.max_size = max_size
+
+	def key(self, dim, T, n, max, is_special, counts_only=False, accumulate_only=False):
+		params = [engine_version, dim, T, n, max, bool(is_special), bool(counts_only)]
+		# appended only when set, so the keys of the complete results are kept
+		if accumulate_only:
+			params.append(True)
+		return hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+
+	def getFileName(self, dim, T, n, max, is_special, counts_only=False, accumulate_only=False):
+		return os.path.join(self.path, self.key(dim, T, n, max, is_special, counts_only, accumulate_only) + extension)
+
+	def get(self, dim, T, n, max, is_special, counts_only=False, accumulate_only=False):
+		# a complete result also serves a request for the counts only or for
+		# the accumulated spaces only
+		for only in ([False, True] if counts_only else [False]):
+			for accumulated in ([False, True] if accumulate_only else [False]):
+				fname = self.getFileName(dim, T, n, max, is_special, only, accumulated)
+				if os.path.exists(fname):
+					os.utime(fname)
+					return fname
+		return ''
+
+	def put(self, save, dim, T, n, max, is_special, counts_only=False, accumulate_only=False):
+		os.makedirs(self.path, exist_ok=True)
+		fname = self.getFileName(dim, T, n, max, is_special, counts_only, accumulate_only)
+		temp_name = fname[:-len(extension)] + '.tmp' + extension
+		save(temp_name)
+		os.replace(temp_name, fname)
+		self.evict()
+		return fname
+
+	def evict(self):
+		fnames = [
+			os.path.join(self.path, fname) for fname in os.listdir(self.path)
+			if fname.endswith(extension) and not fname.endswith('.tmp' + extension)
+		]
+		fnames.sort(key=os.path.getmtime)
+		size = sum(os.path.getsize(fname) for fname in fnames)
+		# the most recent file is kept even if it is over the budget by itself
+		for fname in fnames[:-1]:
+			if size <= self.max_size:
+				break
+			file_size = os.path.getsize(fname)
+			try:
+				os.remove(fname)
+			except OSError:
+				continue
+			size -= file_size
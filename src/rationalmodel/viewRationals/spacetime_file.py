@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import struct
+import numpy as np
+
+
+# binary spacetime file:
+#   magic + format version
+#   arrays, one after the other, aligned to 64 bytes
+#   json index with the header values and dtype, shape and offset of every array
+#   offset of the json index
+# the positions are integer half units since version 2, they were floats before
+# the header value rationals is false when the cells were saved without them,
+# the files without it always have them. The header value counts_only is true
+# when the times and next digits of the cells were left at zero
+magic = b'RSPT'
+version = 2
+alignment = 64
+extension = '.spt'
+
+slice_columns = [
+	'pos', 'count', 'time', 'next_digits',
+	'orbit', 'rational_cell', 'rational_count', 'rational_time', 'rational_digits',
+	'm_offsets', 'm'
+]
+
+
+def slice_names(max):
+	return [str(t) for t in range(max + 1)] + ['accumulates_even', 'accumulates_odd']
+
+
+def is_binary(fname):
+	return os.path.splitext(fname)[1].lower() == extension
+
+
+class SpaceTimeWriter:
+	def __init__(self, fname, header: dict):
+		self.header = dict(header)
+		self.header['format'] = version
+		self.header['arrays'] = {}
+		self.fp = open(fname, 'wb')
+		self.fp.write(magic + struct.pack('<I', version))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def write(self, name, array: np.ndarray):
+		array = np.ascontiguousarray(array)
+		offset = self.fp.tell()
+		padding = -offset % alignment
+		self.fp.write(b'\0' * padding)
+		offset += padding
+		self.fp.write(array.tobytes())
+		self.header['arrays'][name] = {
+			'dtype': array.dtype.str,
+			'shape': list(array.shape),
+			'offset': offset
+		}
+
+	def write_slice(self, name, columns: dict):
+		for column in slice_columns:
+			self.write(f'{name}/{column}', columns[column])
+
+	def close(self):
+		if self.fp.closed:
+			return
+		offset = self.fp.tell()
+		self.fp.write(json.dumps(self.header).encode('utf-8'))
+		self.fp.write(struct.pack('<Q', offset))
+		self.fp.close()
+
+
+class SpaceTimeReader:
+	def __init__(self, fname, mmap=False):
+		self.fname = fname
+		self.mmap = mmap
+		self.fp = open(fname, 'rb')
+		if self.fp.read(len(magic)) != magic:
+			raise ValueError(f'{fname} is not a spacetime file')
+		self.fp.seek(-8, os.SEEK_END)
+		end = self.fp.tell()
+		offset, = struct.unpack('<Q', self.fp.read(8))
+		self.fp.seek(offset)
+		self.header = json.loads(self.fp.read(end - offset).decode('utf-8'))
+		self.arrays = self.header['arrays']
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def read(self, name) -> np.ndarray:
+		info = self.arrays[name]
+		dtype = np.dtype(info['dtype'])
+		shape = tuple(info['shape'])
+		if self.mmap and int(np.prod(shape)) == 0:
+			array = np.zeros(shape, dtype=dtype)
+		elif self.mmap:
+			array = np.memmap(self.fname, dtype=dtype, mode='r', offset=info['offset'], shape=shape)
+		else:
+			self.fp.seek(info['offset'])
+			array = np.fromfile(self.fp, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+		if name.endswith('/pos') and self.header['format'] < 2:
+			return half_units(array)
+		return array
+
+	def read_slice(self, name) -> dict:
+		return {column: self.read(f'{name}/{column}') for column in slice_columns}
+
+	def close(self):
+		self.fp.close()
+
+
+def half_units(positions):
+	# positions of the files before version 2 to integer half units
+	return np.rint(2 * np.asarray(positions, dtype=np.float64)).astype(np.int64)
+
+
+def upgrade_json(content: dict):
+	# json files have the version of the binary files they were saved with
+	if content.get('format', 1) < 2:
+		for cells in content['spaces'].values():
+			for cell in cells:
+				cell['pos'] = half_units(cell['pos']).tolist()
+		content['format'] = version
+	return content
+
+
+def cells_to_columns(cells: list[dict], dim):
+	# cells as saved in the json files, with the time averaged by count
+	base = 2**dim
+	num = len(cells)
+	columns = {
+		'pos': np.array([cell['pos'] for cell in cells], dtype=np.int64).reshape(num, dim),
+		'count': np.array([cell['count'] for cell in cells], dtype=np.int64),
+		'time': np.array([cell['time'] * cell['count'] for cell in cells], dtype=np.float64),
+		'next_digits': np.array(
+			[[cell['next_digits'][str(d)] for d in range(base)] for cell in cells], dtype=np.int64
+		).reshape(num, base)
+	}
+	columns.update(rationals_to_columns([cell['rationals'] for cell in cells]))
+	return columns
+
+
+def columns_to_cells(columns: dict, dim):
+	cells = []
+	for i in range(len(columns['count'])):
+		count = int(columns['count'][i])
+		cells.append({
+			'pos': columns['pos'][i].tolist(),
+			'count': count,
+			'time': float(columns['time'][i]) / count,
+			'next_digits': {str(d): int(num) for d, num in enumerate(columns['next_digits'][i].tolist())},
+			'rationals': []
+		})
+	offsets = columns['m_offsets']
+	for i in range(len(columns['orbit'])):
+		cells[int(columns['rational_cell'][i])]['rationals'].append({
+			'm': columns['m'][offsets[i]:offsets[i + 1]].tolist(),
+			'digits': str(columns['rational_digits'][i]),
+			'count': int(columns['rational_count'][i]),
+			'time': float(columns['rational_time'][i])
+		})
+	return cells
+
+
+def rationals_to_columns(cells_rationals: list[list[dict]]):
+	orbit = []
+	rational_cell = []
+	rational_count = []
+	rational_time = []
+	rational_digits = []
+	m_offsets = [0]
+	ms = []
+	for index, rationals in enumerate(cells_rationals):
+		for rational in rationals:
+			orbit.append(rational.get('orbit', rational['m'][0]))
+			rational_cell.append(index)
+			rational_count.append(rational['count'])
+			rational_time.append(rational['time'])
+			rational_digits.append(rational['digits'])
+			ms += rational['m']
+			m_offsets.append(len(ms))
+	return {
+		'orbit': np.array(orbit, dtype=np.int64),
+		'rational_cell': np.array(rational_cell, dtype=np.int64),
+		'rational_count': np.array(rational_count, dtype=np.int64),
+		'rational_time': np.array(rational_time, dtype=np.float64),
+		'rational_digits': np.array(rational_digits, dtype=np.str_) if rational_digits else np.zeros(0, dtype='U1'),
+		'm_offsets': np.array(m_offsets, dtype=np.int64),
+		'm': np.array(ms, dtype=np.int64)
+	}
+
+
+def columns_to_rationals(columns: dict):
+	# yields (cell index, m, orbit, digits, time) for every member of every saved rational
+	offsets = columns['m_offsets']
+	ms = columns['m']
+	for i in range(len(columns['orbit'])):
+		cell = int(columns['rational_cell'][i])
+		orbit = int(columns['orbit'][i])
+		digits = str(columns['rational_digits'][i])
+		time = float(columns['rational_time'][i])
+		for m in ms[offsets[i]:offsets[i + 1]]:
+			yield cell, int(m), orbit, digits, time
+
+
+def convert_json(json_name, out_name=''):
+	if not out_name:
+		out_name = os.path.splitext(json_name)[0] + extension
+	with open(json_name, 'rt') as fp:
+		content = upgrade_json(json.load(fp))
+	# every header value goes over, the format is the one the file is written in
+	header = {key: value for key, value in content.items() if key not in ['format', 'spaces']}
+	with SpaceTimeWriter(out_name, header) as writer:
+		for name in slice_names(content['max']):
+			writer.write_slice(name, cells_to_columns(content['spaces'][name], content['dim']))
+			del content['spaces'][name]
+	return out_name
+
+
+if __name__ == '__main__':
+	for json_name in sys.argv[1:]:
+		print(f'------- converting {json_name}')
+		print(f'------- saved {convert_json(json_name)}')
@@ -3,9 +3,9 @@ import json
 import gc
 import numpy as np
 
-from rationals import Rational, c
+from rationals import Rational
+from spacetime_file import upgrade_json, version
 from timing import timing
-from config import config
 
 
 spacetime = None
@@ -81,7 +81,6 @@ class Cell(object):
 		self.x = x
 		self.y = y
 		self.z = z
-		self.key = f'{t:5.1f}{x:5.1f}{y:5.1f}{z:5.1f}'.format(t, x, y, z)
 		self.count = 0
 		self.time = 0.0
 		self.next_digits = dict(zip([x for x in range(2**self.dim)], [0 for _ in range(2**self.dim)]))
@@ -130,204 +129,6 @@ class Cell(object):
 				self.rationals.add(m, rational['m'], rational['digits'], rational['time'])
 
 
-class Bbox:
-	def __init__(self, bmin: np.array, bmax: np.array):
-		self.min = bmin
-		self.max = bmax
-
-	def get_subbox(self, index: str):
-		centre = (self.min + self.max) * 0.5
-		dist =   (self.max - self.min) * 0.5
-		delta = np.array([0., 0., 0.])
-		for i in range(3):
-			if index[i] == '1':
-				delta[i] = -dist[i]
-		bmin = centre   + delta
-		bmax = self.max + delta
-		return Bbox(bmin, bmax)
-
-	def inside(self, point: np.array):
-		if self.min[0] <= point[0] <= self.max[0] and\
-		   self.min[1] <= point[1] <= self.max[1] and\
-		   self.min[2] <= point[2] <= self.max[2]:
-			return True
-		return False
-	
-	def __str__(self) -> str:
-		return f'({self.min}, {self.max})'
-
-	def __repr__(self) -> str:
-		return f'bbox({self.min}, {self.max})'
-
-
-def _insert_cell(cells: list[Cell], indexes: list[int], dim, T, n, t, x, y, z):
-
-	def cmp(at, ax, ay, az, bt, bx, by, bz):
-		if at < bt: return -1
-		if at > bt: return  1
-		if ax < bx: return -1
-		if ax > bx: return  1
-		if ay < by: return -1
-		if ay > by: return  1
-		if az < bz: return -1
-		if az > bz: return  1
-		return 0
-	
-	def insert_cell(cells: list[Cell], init, end, dim, T, n, t, x, y, z, cmp) -> int:
-		if len(cells) == 0:
-			cells.append(Cell(dim, T, n, t, x, y, z))
-			return 0
-		
-		cinit = cells[init]
-		res_init = cmp(cinit.t, cinit.x, cinit.y, cinit.z, t, x, y,z)
-
-		position = (init + end) // 2
-		cpos = cells[position]
-		res_position = cmp(cpos.t, cpos.x, cpos.y, cpos.z, t, x, y,z)
-		
-		if end == init:
-			if res_init < 0:
-				cells.insert(end, Cell(dim, T, n, t, x, y, z))
-				return end
-			elif res_init > 0:
-				cells.insert(init, Cell(dim, T, n, t, x, y, z))
-				return init
-			else:
-				return init
-		elif end == init + 1:
-			if res_init < 0:
-				cells.insert(end, Cell(dim, T, n, t, x, y, z))
-				return end
-			elif res_init > 0:
-				cells.insert(init, Cell(dim, T, n, t, x, y, z))
-				return init
-			else:
-				return init
-		else:
-			if res_position == 0:
-				return position
-			elif res_position > 0:
-				return insert_cell(cells, init, position, dim, T, n, t, x, y, z, cmp)
-			else:
-				return insert_cell(cells, position, end,  dim, T, n, t, x, y, z, cmp)
-
-	def insert_index(indexes: list[int], cells: list[Cell], init, end, cell_index: int, cmp):
-		if len(indexes) == 0:
-			indexes.append(cell_index)
-			return 0
-
-		ckey = cells[cell_index]
-		cinit = cells[indexes[init]]
-		position = (init + end) // 2
-		cpos = cells[indexes[position]]
-
-		res_init = cmp(
-			cinit.t, cinit.x, cinit.y, cinit.z,
-			ckey.t, ckey.x, ckey.y, ckey.z
-		)
-		res_position = cmp(
-			cpos.t, cpos.x, cpos.y, cpos.z,
-			ckey.t, ckey.x, ckey.y, ckey.z
-		)
-
-		if end == init:
-			if  res_init < 0:
-				indexes.insert(end, cell_index)
-				return end
-			elif res_init > 0:
-				indexes.insert(init, cell_index)
-				return init
-			else:
-				return init
-		elif end == init + 1:
-			if  res_init < 0:
-				indexes.insert(end, cell_index)
-				return end
-			elif res_init > 0:
-				indexes.insert(init, cell_index)
-				return init
-			else:
-				return init
-		else:
-			if res_position == 0:
-				return position
-			elif res_position > 0:
-				return insert_index(indexes, cells, init, position, cell_index, cmp)
-			else:
-				return insert_index(indexes, cells, position, end,  cell_index, cmp)
-
-	cell_index = insert_cell(cells, 0, len(cells), dim, T, n, t, x, y, z, cmp)
-	insert_index(indexes, cells, 0, len(indexes), cell_index, cmp)
-	return cells[cell_index]
-
-class OctTreeItem:
-	def __init__(self, dim: int, t: int, level: int, max_level: int, bbox: Bbox):
-		self.dim = dim
-		self.cells_indexes: list[int] = []
-		self.bbox: Bbox = bbox
-		self.children: list[OctTreeItem] = []
-		self.level = level
-		if level == max_level or level >= t:
-			return
-		if self.dim == 1:
-			z = 0
-			y = 0
-			for x in range(2):
-				bbox = self.bbox.get_subbox(f'{x}{y}{z}')
-				self.children.append(OctTreeItem(dim, t, level+1, max_level, bbox))
-		elif self.dim == 2:
-			z = 0
-			for y in range(2):
-				for x in range(2):
-					bbox = self.bbox.get_subbox(f'{x}{y}{z}')
-					self.children.append(OctTreeItem(dim, t, level+1, max_level, bbox))
-		elif self.dim == 3:
-			for z in range(2):
-				for y in range(2):
-					for x in range(2):
-						bbox = self.bbox.get_subbox(f'{x}{y}{z}')
-						self.children.append(OctTreeItem(dim, t, level+1, max_level, bbox))
-
-	def __del__(self):
-		del self.cells_indexes
-		del self.bbox
-		del self.children
-
-	def get_cell(self, cells: list[Cell], dim, T, n, t, x, y=0, z=0) -> Cell | None:
-		if not self.bbox.inside(np.array([x, y, z])):
-			return None
-		if not self.children:
-			cell = _insert_cell(cells, self.cells_indexes, dim, T, n, t, x, y, z)
-			return cell
-		else:
-			for child in self.children:
-				cell = child.get_cell(cells, dim, T, n, t, x, y, z)
-				if cell:
-					return cell
-		return None
-	
-	def clear(self):
-		del self.cells_indexes
-		self.cells_indexes = []
-		for child in self.children:
-			child.clear()
-
-
-class OctTree:
-	def __init__(self, dim: int, t: int, max_levels: int, bbox: Bbox) -> None:
-		self.bbox = bbox
-		self.root = OctTreeItem(dim, t, 0, max_levels, self.bbox)
-
-	def __del__(self):
-		del self.root
-	
-	def get_cell(self, cells: list[Cell], dim, T, n, t, x, y=0, z=0) -> Cell:
-		return self.root.get_cell(cells, dim, T, n, t, x, y, z)
-	
-	def clear(self):
-		self.root.clear()
-
-
 class Space(object):
 	def __init__(self, t, dim, T, n, max, name='normal'):
 		self.t = t
@@ -337,18 +138,35 @@ class Space(object):
 		self.name = name
 		self.base = 2**dim
 		self.cells: list[Cell] = []
-		d = t * 0.5
-		if dim == 1: bbox = Bbox(np.array([-d,  0,  0]), np.array([d, 0, 0]))
-		if dim == 2: bbox = Bbox(np.array([-d, -d,  0]), np.array([d, d, 0]))
-		if dim == 3: bbox = Bbox(np.array([-d, -d, -d]), np.array([d, d, d]))
-		self.hash_tree = OctTree(dim, t, config.get('max_octtree_levels'), bbox)
+		# cells by their half unit coordinates packed in a single integer
+		self.keys: dict[int, Cell] = {}
+		self.width = 2 * t + 1
+		self.sorted = True
 
 	def __del__(self):
 		del self.cells
-		del self.hash_tree
-
-	def getCell(self, x, y=0.0, z=0.0) -> Cell:
-		return self.hash_tree.get_cell(self.cells, self.dim, self.T, self.n, self.t, x, y, z)
+		del self.keys
+
+	def getKey(self, x, y=0, z=0):
+		ix = x + self.t
+		iy = y + self.t
+		iz = z + self.t
+		w = self.width
+		if not (0 <= ix < w and 0 <= iy < w and 0 <= iz < w):
+			return -1
+		return ((self.t * w + ix) * w + iy) * w + iz
+
+	def getCell(self, x, y=0, z=0) -> Cell:
+		key = self.getKey(x, y, z)
+		if key < 0:
+			return None
+		cell = self.keys.get(key)
+		if cell is None:
+			cell = Cell(self.dim, self.T, self.n, self.t, x, y, z)
+			self.keys[key] = cell
+			self.cells.append(cell)
+			self.sorted = False
+		return cell
 
 	def countCells(self):
 		l = 0
@@ -358,6 +176,9 @@ class Space(object):
 		return l
 
 	def getCells(self) -> list[Cell]:
+		if not self.sorted:
+			self.cells.sort(key=lambda cell: (cell.x, cell.y, cell.z))
+			self.sorted = True
 		return self.cells
 
 	def add(self, time, reminders, digits, m, next_digit, x, y, z):
@@ -368,11 +189,12 @@ class Space(object):
 
 	def clear(self):
 		self.cells = []
-		self.hash_tree.clear()
+		self.keys = {}
+		self.sorted = True
 
 	def save(self):
 		objs = []
-		for cell in self.cells:
+		for cell in self.getCells():
 			objs.append(cell.get())
 		return objs
 	
@@ -403,13 +225,13 @@ class Spaces:
 		if t < self.max - cycle and is_special:
 			return
 		if self.dim == 1:
-			if (x == t * c or x == -t * c) and is_special:
+			if (x == t or x == -t) and is_special:
 				return
 		elif self.dim == 2:
-			if (x == y == t * c or x == y == -t * c) and is_special:
+			if (x == y == t or x == y == -t) and is_special:
 				return
 		else:
-			if (x == y == z == t * c or x == y == z == -t * c) and is_special:
+			if (x == y == z == t or x == y == z == -t) and is_special:
 				return
 		if t%2 == 0:
 			self.accumulates_even.add(time, reminders, digits, m, next_digit, x, y, z)
@@ -588,6 +410,7 @@ class SpaceTime(object):
 			'special': self.is_special,
 			'T': self.T,
 			'max': self.max,
+			'format': version,
 			'spaces': spaces
 		}
 
@@ -597,7 +420,7 @@ class SpaceTime(object):
 	@timing
 	def load(self, fname):
 		with open(fname, 'rt') as fp:
-			content = json.load(fp)
+			content = upgrade_json(json.load(fp))
 
 		self.__init__(content['T'], content['num'], content['max'], content['dim'])
 		self.is_special = content['special']
@@ -1,10 +1,17 @@
 import os
-from multiprocessing import Pool, cpu_count, managers
 import json
 import gc
+from itertools import islice
+import numpy as np
 from openpyxl import Workbook
 
-from rationals import Rational, c
+from rationals import Rational, orbit_chunks, orbit_members
+from spacetime_numpy import compute_grids, compute_numbers_grids, compute_slice, chunk_size, \
+	accumulated_times, accumulate_size, accumulate as accumulate_grids
+from spacetime_file import SpaceTimeWriter, SpaceTimeReader, slice_names, is_binary, \
+	rationals_to_columns, columns_to_rationals, upgrade_json, version
+from cell_view import CellsView
+from session import EngineSession, SessionManager
 from timing import timing, get_last_duration
 from utils import collect, divisors
 from config import Config
@@ -21,10 +28,18 @@ def eq_digits(q: str, r: str):
 	return False
 
 
-class HashRationalsItem:
-	def __init__(self, min, max):
-		self.min = min
-		self.max = max
+def cell_index(t, dim, x, y=0, z=0):
+	# index of the cell at the half unit coordinates (x, y, z) of a space of
+	# time t, truncated towards zero when a coordinate has not the parity of t
+	v = t - x
+	if dim > 1:
+		v += (t + 1) * ((t - y) + ((t + 1) * (t - z) if dim > 2 else 0))
+	return v // 2 if v >= 0 else -((-v) // 2)
+
+
+class HashRationals:
+	def __init__(self):
+		# one entry per orbit, keyed by the orbit representative
 		self.rationals = []
 		self.indexes = {}
 
@@ -32,46 +47,27 @@ class HashRationalsItem:
 		del self.rationals
 		del self.indexes
 
-	def add(self, m, reminders, digits, time):
-		if not self.min <= m <= self.max:
-			return False
-		
-		if m not in self.indexes:
+	def add(self, m, orbit, digits, time):
+		if orbit not in self.indexes:
+			self.indexes[orbit] = len(self.rationals)
 			self.rationals.append({
 				'm': [m],
 				'digits': digits,
 				'count': 1,
 				'time': time
 			})
-			i = len(self.rationals) - 1
-			for r in reminders:
-				self.indexes[r] = i
-		elif m not in self.rationals[self.indexes[m]]['m']:
-			self.rationals[self.indexes[m]]['m'].append(m)
-			self.rationals[self.indexes[m]]['count'] += 1
-
-		return True
-
-
-class HashRationals:
-	def __init__(self, num, size=100000):
-		self.hash: list[HashRationalsItem] = []
-		for i in range(0, num, size):
-			self.hash.append(HashRationalsItem(i, i+size-1))
-
-	def __del__(self):
-		del self.hash
+			return
+		rational = self.rationals[self.indexes[orbit]]
+		if m not in rational['m']:
+			rational['m'].append(m)
+			rational['count'] += 1
 
-	def add(self, m, reminders, digits, time):
-		for item in self.hash:
-			if item.add(m, reminders, digits, time):
-				return True
-	
 	def get_rationals(self):
-		rationals = []
-		for item in self.hash:
-			rationals += item.rationals
-		return rationals
+		return self.rationals
+
+	def items(self):
+		for orbit, index in self.indexes.items():
+			yield orbit, self.rationals[index]
 
 
 class Cell(object):
@@ -85,23 +81,23 @@ class Cell(object):
 		self.count = 0
 		self.time = 0.0
 		self.next_digits = dict(zip([x for x in range(2**self.dim)], [0 for _ in range(2**self.dim)]))
-		self.rationals = HashRationals(self.n)
+		self.rationals = HashRationals()
 
 	def __del__(self):
 		del self.next_digits
 		del self.rationals
 
-	def add(self, time: int, reminders: list[int], digits: str, m: int, next_digit: int):
+	def add(self, time: int, orbit: int, digits: str, m: int, next_digit: int):
 		self.count += 1
 		self.time += time
 		self.next_digits[next_digit] += 1
-		self.rationals.add(m, reminders, digits, time)
+		self.rationals.add(m, orbit, digits, time)
 
 	def clear(self):
 		self.count = 0
 		self.time = 0.0
 		self.next_digits = dict(zip([x for x in range(2**self.dim)], [0 for _ in range(2**self.dim)]))
-		self.rationals = HashRationals(self.n)
+		self.rationals = HashRationals()
 
 	def get(self):
 		pos = (self.x, )
@@ -124,10 +120,10 @@ class Cell(object):
 		self.next_digits = dict(zip([x for x in range(2**self.dim)], [0 for _ in range(2**self.dim)]))
 		for x in [x for x in range(2**self.dim)]:
 			self.next_digits[x] = next_digits[str(x)]
-		self.rationals = HashRationals(self.n)
+		self.rationals = HashRationals()
 		for rational in rationals:
 			for m in rational['m']:
-				self.rationals.add(m, rational['m'], rational['digits'], rational['time'])
+				self.rationals.add(m, rational['m'][0], rational['digits'], rational['time'])
 
 
 class Space(object):
@@ -147,10 +143,7 @@ class Space(object):
 		del self.cells
 
 	def getCell(self, x, y=0, z=0):
-		nx =  c * self.t - x
-		ny = (c * self.t - y) if self.dim > 1 else 0.0
-		nz = (c * self.t - z) if self.dim > 2 else 0.0
-		n = int(nx + (self.t + 1) * (ny + (self.t + 1) * nz))
+		n = cell_index(self.t, self.dim, x, y, z)
 		if n < 0 or n >= len(self.indexes):
 			return None
 		if self.indexes[n] < 0:
@@ -164,11 +157,14 @@ class Space(object):
 	def getCells(self):
 		return self.cells
 
-	def add(self, time, reminders, digits, m, next_digit, x, y, z):
+	def getCounts(self):
+		return np.array([cell.count for cell in self.cells], dtype=np.int64)
+
+	def add(self, time, orbit, digits, m, next_digit, x, y, z):
 		cell = self.getCell(x, y, z)
 		if not cell:
 			return
-		cell.add(time, reminders, digits, m, next_digit)
+		cell.add(time, orbit, digits, m, next_digit)
 
 	def clear(self):
 		for cell in self.cells:
@@ -190,6 +186,37 @@ class Space(object):
 			cell = self.getCell(*in_cell['pos'])
 			cell.set(in_cell['count'], in_cell['time'], in_cell['next_digits'], in_cell['rationals'])
 
+	def getColumns(self):
+		num = len(self.cells)
+		columns = {
+			'pos': np.array([(cell.x, cell.y, cell.z)[:self.dim] for cell in self.cells], dtype=np.int64).reshape(num, self.dim),
+			'count': np.array([cell.count for cell in self.cells], dtype=np.int64),
+			'time': np.array([cell.time for cell in self.cells], dtype=np.float64),
+			'next_digits': np.array(
+				[[cell.next_digits[d] for d in range(self.base)] for cell in self.cells], dtype=np.int64
+			).reshape(num, self.base)
+		}
+		columns.update(rationals_to_columns([
+			[dict(rational, orbit=orbit) for orbit, rational in cell.rationals.items()] for cell in self.cells
+		]))
+		return columns
+
+	def setColumns(self, columns: dict):
+		self.setCells(columns['pos'], columns['count'], columns['time'], columns['next_digits'])
+		for index, m, orbit, digits, time in columns_to_rationals(columns):
+			self.cells[index].rationals.add(m, orbit, digits, time)
+
+	def setCells(self, positions, counts, times, next_digits):
+		self.clear()
+		for pos, count, time, digits in zip(positions.tolist(), counts.tolist(), times.tolist(), next_digits.tolist()):
+			cell = self.getCell(*pos)
+			if not cell:
+				continue
+			cell.count = int(count)
+			cell.time = float(time)
+			for digit in range(self.base):
+				cell.next_digits[digit] = int(digits[digit])
+
 	def getMaxTime(self):
 		max_time = -1
 		for cell in self.cells:
@@ -198,38 +225,194 @@ class Space(object):
 		return max_time
 
 
+class GridSpace(object):
+	# same interface as Space over dense arrays with an entry for every cell,
+	# the rationals of a cell are only kept when they are added one by one
+	def __init__(self, t, dim, T, n, name='normal'):
+		self.t = t
+		self.T = T
+		self.n = n
+		self.dim = dim
+		self.name = name
+		self.base = 2**dim
+		self.size = (t + 1)**dim
+		self.count = np.zeros(self.size, dtype=np.int64)
+		self.time = np.zeros(self.size, dtype=np.float64)
+		self.next_digits = np.zeros((self.size, self.base), dtype=np.int64)
+		self.pos = np.zeros((self.size, dim), dtype=np.int64)
+		# creation order of the cells, -1 for the cells not created yet
+		self.order = np.full(self.size, -1, dtype=np.int64)
+		self.num_cells = 0
+		self.rationals: dict[int, HashRationals] = {}
+
+	def getIndex(self, x, y=0, z=0):
+		n = cell_index(self.t, self.dim, x, y, z)
+		if n < 0 or n >= self.size:
+			return -1
+		if self.order[n] < 0:
+			self.order[n] = self.num_cells
+			self.num_cells += 1
+			self.pos[n] = (x, y, z)[:self.dim]
+		return n
+
+	def getCell(self, x, y=0, z=0):
+		n = self.getIndex(x, y, z)
+		if n < 0:
+			return None
+		return CellsView(
+			self.dim, self.pos[n:n+1], self.count[n:n+1], self.time[n:n+1], self.next_digits[n:n+1],
+			{0: self.rationals[n]} if n in self.rationals else None
+		)[0]
+
+	def countCells(self):
+		return self.num_cells
+
+	def _cells(self):
+		cells = np.flatnonzero(self.order >= 0)
+		return cells[np.argsort(self.order[cells])]
+
+	def getCells(self):
+		cells = self._cells()
+		rationals = {i: self.rationals[n] for i, n in enumerate(cells.tolist()) if n in self.rationals}
+		return CellsView(self.dim, self.pos[cells], self.count[cells], self.time[cells], self.next_digits[cells], rationals)
+
+	def getCounts(self):
+		return self.count[self._cells()]
+
+	def add(self, time, orbit, digits, m, next_digit, x, y, z):
+		n = self.getIndex(x, y, z)
+		if n < 0:
+			return
+		self.count[n] += 1
+		self.time[n] += time
+		self.next_digits[n, next_digit] += 1
+		if n not in self.rationals:
+			self.rationals[n] = HashRationals()
+		self.rationals[n].add(m, orbit, digits, time)
+
+	def clear(self):
+		self.count.fill(0)
+		self.time.fill(0.0)
+		self.next_digits.fill(0)
+		self.order.fill(-1)
+		self.num_cells = 0
+		self.rationals = {}
+
+	def save(self):
+		out_cells = []
+		for n in self._cells().tolist():
+			count = int(self.count[n])
+			out_cells.append({
+				'pos': tuple(self.pos[n].tolist()),
+				'count': count,
+				'time': float(self.time[n]) / float(count),
+				'next_digits': dict(enumerate(self.next_digits[n].tolist())),
+				'rationals': self.rationals[n].get_rationals() if n in self.rationals else []
+			})
+		return out_cells
+
+	def load(self, input: list[dict]):
+		self.clear()
+		for in_cell in input:
+			n = self.getIndex(*in_cell['pos'])
+			self.count[n] = in_cell['count']
+			self.time[n] = in_cell['time']
+			for digit in range(self.base):
+				self.next_digits[n, digit] = in_cell['next_digits'][str(digit)]
+			for rational in in_cell['rationals']:
+				if n not in self.rationals:
+					self.rationals[n] = HashRationals()
+				for m in rational['m']:
+					self.rationals[n].add(m, rational['m'][0], rational['digits'], rational['time'])
+
+	def getColumns(self):
+		cells = self._cells()
+		columns = {
+			'pos': self.pos[cells],
+			'count': self.count[cells],
+			'time': self.time[cells],
+			'next_digits': self.next_digits[cells]
+		}
+		columns.update(rationals_to_columns([
+			[dict(rational, orbit=orbit) for orbit, rational in self.rationals[n].items()] if n in self.rationals else []
+			for n in cells.tolist()
+		]))
+		return columns
+
+	def setColumns(self, columns: dict):
+		cells = self.setCells(columns['pos'], columns['count'], columns['time'], columns['next_digits'])
+		for index, m, orbit, digits, time in columns_to_rationals(columns):
+			n = int(cells[index])
+			if n not in self.rationals:
+				self.rationals[n] = HashRationals()
+			self.rationals[n].add(m, orbit, digits, time)
+
+	def setCells(self, positions, counts, times, next_digits):
+		self.clear()
+		positions = np.asarray(positions, dtype=np.int64)[:, :self.dim]
+		v = np.zeros(len(positions), dtype=np.int64)
+		for axis in reversed(range(self.dim)):
+			v = v * (self.t + 1) + (self.t - positions[:, axis])
+		cells = np.where(v >= 0, v // 2, -((-v) // 2))
+		valid = (cells >= 0) & (cells < self.size)
+		index = cells[valid]
+		self.count[index] = counts[valid]
+		self.time[index] = times[valid]
+		self.next_digits[index] = next_digits[valid]
+		self.pos[index] = positions[valid]
+		self.order[index] = np.arange(len(index))
+		self.num_cells = len(index)
+		return cells
+
+	def getMaxTime(self):
+		# the cells not created have a zero time, below or at that of any cell
+		if self.num_cells == 0:
+			return -1
+		return float(self.time.max())
+
+	def nbytes(self):
+		return sum(array.nbytes for array in (self.count, self.time, self.next_digits, self.pos, self.order))
+
+
 class Spaces:
-	def __init__(self, T, n, max, dim=1) -> None:
+	def __init__(self, T, n, max, dim=1, dense=False, accumulate_only=False) -> None:
 		self.T = T
 		self.n = n
 		self.max = max
 		self.dim = dim
-		self.spaces = [Space(t, dim, T, n) for t in range(max + 1)]
-		self.accumulates_even = Space(max if T%2 == 0 else max-1, dim, T, n, name='even')
-		self.accumulates_odd  = Space(max if T%2 == 1 else max-1, dim, T, n, name='odd' )
+		self.accumulate_only = accumulate_only
+		space = GridSpace if dense else Space
+		if accumulate_only:
+			# only the accumulated spaces are kept, every time shares an empty space
+			self.spaces = [space(0, dim, T, n, name='empty')] * (max + 1)
+		else:
+			self.spaces = [space(t, dim, T, n) for t in range(max + 1)]
+		self.accumulates_even = space(max if T%2 == 0 else max-1, dim, T, n, name='even')
+		self.accumulates_odd  = space(max if T%2 == 1 else max-1, dim, T, n, name='odd' )
 
 	def __del__(self):
 		del self.spaces
 		del self.accumulates_even
 		del self.accumulates_odd
 
-	def add(self, is_special, t, reminders, digits, m, next_digit, time, cycle, x, y, z):
-		self.spaces[t].add(time, reminders, digits, m, next_digit, x, y, z)
+	def add(self, is_special, t, orbit, digits, m, next_digit, time, cycle, x, y, z):
+		if not self.accumulate_only:
+			self.spaces[t].add(time, orbit, digits, m, next_digit, x, y, z)
 		if t < self.max - cycle and is_special:
 			return
 		if self.dim == 1:
-			if (x == t * c or x == -t * c) and is_special:
+			if (x == t or x == -t) and is_special:
 				return
 		elif self.dim == 2:
-			if (x == y == t * c or x == y == -t * c) and is_special:
+			if (x == y == t or x == y == -t) and is_special:
 				return
 		else:
-			if (x == y == z == t * c or x == y == z == -t * c) and is_special:
+			if (x == y == z == t or x == y == z == -t) and is_special:
 				return
 		if t%2 == 0:
-			self.accumulates_even.add(time, reminders, digits, m, next_digit, x, y, z)
+			self.accumulates_even.add(time, orbit, digits, m, next_digit, x, y, z)
 		else:
-			self.accumulates_odd.add(time, reminders, digits, m, next_digit, x, y, z)
+			self.accumulates_odd.add(time, orbit, digits, m, next_digit, x, y, z)
 
 	def getMaxTime(self, accumulate):
 		max_time = -1
@@ -253,6 +436,8 @@ class Spaces:
 		self.accumulates_odd.clear()
 
 	def getCell(self, t, x, y=0, z=0, accumulate=False):
+		if not accumulate and self.accumulate_only:
+			return None
 		if not accumulate:
 			return self.spaces[t].getCell(x, y, z)
 		else:
@@ -270,6 +455,9 @@ class Spaces:
 			else:
 				return self.accumulates_odd.getCells()
 
+	def getCounts(self, t, accumulate=False):
+		return self.getSpace(t, accumulate).getCounts()
+
 	def getSpace(self, t, accumulate=False):
 		if not accumulate:
 			return self.spaces[t]
@@ -279,6 +467,24 @@ class Spaces:
 			else:
 				return self.accumulates_odd
 
+	def setCells(self, t, positions, counts, times, next_digits, accumulate=False):
+		if not accumulate and self.accumulate_only:
+			return
+		self.getSpace(t, accumulate).setCells(positions, counts, times, next_digits)
+
+	def getSpaceByName(self, name):
+		if name == 'accumulates_even':
+			return self.accumulates_even
+		if name == 'accumulates_odd':
+			return self.accumulates_odd
+		return self.spaces[int(name)]
+
+	def getColumns(self, name):
+		return self.getSpaceByName(name).getColumns()
+
+	def setColumns(self, name, columns):
+		self.getSpaceByName(name).setColumns(columns)
+
 	def save(self):
 		output = {}
 		for t in range(self.max + 1):
@@ -296,182 +502,374 @@ class Spaces:
 		self.accumulates_even.load(input['accumulates_even'])
 		self.accumulates_odd.load(input['accumulates_odd'])
 
-class MyManager(managers.BaseManager):
-	...
+SessionManager.register('Spaces', Spaces)
 
-MyManager.register('Spaces', Spaces)
-
-def create_rational(args):
-	m, n, dim = args
-	return Rational(m, n, dim)
+# r is the representative of an orbit, the member k of the orbit is the
+# rational with numerator r.reminders[k], whose digits are those of r
+# shifted k places, so all its values come from the tables of r
 
 
 def add_rational1(args):
-	_, rt, t, x, y, z = args
+	_, k, rt, t, x, y, z = args
 	r: Rational = args[0]
-	px, py, pz = r.position(rt)
-	px += x
-	py += y
-	pz += z
-	reminders = r.reminders
+	kx, ky, kz = r.position(k)
+	px, py, pz = r.position(k+rt)
+	px += x - kx
+	py += y - ky
+	pz += z - kz
 	digits = r.path()
-	m = r.m
-	next_digit = r.digit(t+rt+1)
-	time = r.time(t+rt)
-	obj = (t+rt, reminders, digits, m, next_digit, time, px, py, pz)
+	digits = digits[k:] + digits[:k]
+	m = r.reminder(k)
+	next_digit = r.digit(k+t+rt+1)
+	time = r.time(k+t+rt) - r.time(k)
+	obj = (t+rt, r.m, digits, m, next_digit, time, px, py, pz)
 	return obj
 
 
+def add_member2(args):
+	spaces, is_special, pT, max, r, k, t, x, y, z = args
+	kx, ky, kz = r.position(k)
+	ktime = r.time(k)
+	path = r.path()
+	digits = path[k:] + path[:k]
+	m = r.reminder(k)
+	for rt in range(0, max + 1):
+		px, py, pz = r.position(k+rt)
+		px += x - kx
+		py += y - ky
+		pz += z - kz
+		next_digit = r.digit(k+t+rt+1)
+		time = r.time(k+t+rt) - ktime
+		spaces.add(is_special, t+rt, r.m, digits, m, next_digit, time, pT, px, py, pz)
+
+
 def add_rational2(args):
 	spaces, is_special, pT, max, r, t, x, y, z = args
-	for rt in range(0, max + 1):
-		px, py, pz = r.position(rt)
-		px += x
-		py += y
-		pz += z
-		reminders = r.reminders
-		digits = r.path()
-		m = r.m
-		next_digit = r.digit(t+rt+1)
-		time = r.time(t+rt)
-		spaces.add(is_special, t+rt, reminders, digits, m, next_digit, time, pT, px, py, pz)
+	for k in range(r.period):
+		add_member2((spaces, is_special, pT, max, r, k, t, x, y, z))
+
+
+# algorithms 0 and 1 add the numerators in order, as orbit_members gives
+# them, so the cells and their rationals are made in the same order and
+# keep the same first member as when a Rational was built per numerator
+
+
+def add_members1(args):
+	members, max, t, x, y, z = args
+	results = []
+	for r, k in members:
+		for rt in range(max + 1):
+			results.append(add_rational1((r, k, rt, t, x, y, z)))
+	return results
+
+
+# the orbit workers of algorithm 2 build the rationals of a chunk of
+# representatives themselves, so no set of rationals is ever kept by the parent
+
+
+def add_orbits2(args):
+	spaces, is_special, pT, max, ms, n, dim, t, x, y, z = args
+	for m in ms.tolist():
+		add_rational2((spaces, is_special, pT, max, Rational(m, n, dim), t, x, y, z))
 
 
 class SpaceTime(object):
-	def __init__(self, T, n, max, dim=1):
+	def __init__(self, T, n, max, dim=1, dense=True, session: EngineSession = None):
 		self.T = T
 		self.max = max
 		self.dim = dim
 		self.n = n
+		self.dense = dense
 		self.is_special = False
-		self.manager = MyManager()
-		self.manager.start()
-		self.spaces = self.manager.Spaces(T, n, max, dim)
-		self.rationalSet = []
-		self.algorithm = 2
+		self.accumulate_only = False
+		# the workers are kept between computations and resets
+		self.session = session or EngineSession()
+		self.spaces = Spaces(T, n, max, dim, dense)
+		self.numbers_grids = {}
+		self.algorithm = 3
+		# the numpy engine leaves the rationals of the cells empty, the files
+		# say so in their header
+		self.rationals = True
+		self.counts_only = False
+		self.lazy = False
+		# slices computed so far when they are computed on first use, or None
+		self.grids = None
+		self.accumulated = set()
+		# count and number of cells with it of the spaces already shown, until they change
+		self.histograms = {}
+		# cache and parameters to save the spacetime with once it is complete
+		self.cache_entry = None
 		self.changed = False
 
 	def __del__(self):
 		del self.spaces
-		if self.rationalSet:
-			del self.rationalSet
 		collect()
 
+	def shutdown(self):
+		self.session.shutdown()
+
+	def _pool(self):
+		return self.session.pool() if self.session.processes > 1 else None
+
 	def getParams(self):
 		return self.T, self.n, self.max, self.dim, self.is_special
 
+	def has_rationals(self):
+		return self.rationals
+
+	def has_times(self):
+		# the times and next digits of the cells are only left out by the numpy
+		# engine computing the counts only
+		return not (self.counts_only and self.algorithm == 3)
+
 	def len(self):
 		return self.max
 
 	def clear(self):
 		self.n = 0
 		self.is_special = False
+		self.grids = None
+		self.histograms = {}
+		self.cache_entry = None
 		self.spaces.clear()
 		collect()
 
+	def _slices(self, times):
+		for t in times:
+			if t not in self.grids:
+				self.grids[t] = compute_slice(
+					self.n, self.dim, self.T, t, self.session.processes, self.counts_only, self._pool()
+				)
+				self.spaces.setCells(t, *self.grids[t].occupied())
+
+	def _compute(self, t, accumulate=False):
+		# in the lazy mode a slice is computed the first time it is used, and
+		# an accumulated space from the slices of its parity
+		if self.grids is None:
+			return
+		if not accumulate:
+			self._slices([t])
+			self._put_cache()
+			return
+		parity = t % 2
+		if parity in self.accumulated:
+			return
+		self._slices(accumulated_times(parity, self.T, self.max, self.is_special))
+		acc = accumulate_grids(
+			self.grids, accumulate_size(parity, self.T, self.max), parity, self.dim, self.T, self.max, self.is_special
+		)
+		self.spaces.setCells(parity, *acc.occupied(), accumulate=True)
+		self.accumulated.add(parity)
+		self._put_cache()
+
+	def _computeAll(self):
+		if self.grids is None:
+			return
+		self._slices(range(self.max + 1))
+		self._compute(0, accumulate=True)
+		self._compute(1, accumulate=True)
+
+	def _put_cache(self):
+		if self.cache_entry is None or self.has_pending_slices():
+			return
+		cache, params = self.cache_entry
+		self.cache_entry = None
+		cache.put(self.save, *params)
+
+	def compute_pending(self):
+		# the slices left are computed here, and not by whoever reads them
+		# from the workers of the pool they would be computed with
+		self._computeAll()
+
+	def set_cache(self, cache, params):
+		# the spacetime computed next is put in the cache when it is complete
+		self.cache_entry = (cache, params)
+
 	def getCell(self, t, x, y=0, z=0, accumulate=False):
+		self._compute(t, accumulate)
 		return self.spaces.getCell(t, x, y, z, accumulate)
 
 	def getCells(self, t, accumulate=False):
+		self._compute(t, accumulate)
 		return self.spaces.getCells(t, accumulate)
 	
 	def getSpace(self, t, accumulate=False):
+		self._compute(t, accumulate)
 		return self.spaces.getSpace(t, accumulate)
 	
 	def getMaxTime(self, accumulate=False):
+		self._computeAll()
 		return self.spaces.getMaxTime(accumulate)
+
+	def getHistogram(self, t, accumulate=False):
+		key = (t, accumulate) if not accumulate else (t % 2, accumulate)
+		if key not in self.histograms:
+			self._compute(t, accumulate)
+			self.histograms[key] = np.unique(self.spaces.getCounts(t, accumulate), return_counts=True)
+		return self.histograms[key]
 	
 	@timing
 	def setRationalSet(self, n: int, is_special: bool = False):
+		# the rationals are generated by chunks of numerators while they are added
 		self.n = n
 		self.is_special = is_special
-		p = Pool(cpu_count())
-		params = []
-		for m in range(n + 1):
-			params.append((m, n, self.dim))
-
-		unordered_set = p.imap(func=create_rational, iterable=params, chunksize=10000)
-		p.close()
-		p.join()
 
-		self.rationalSet = list(sorted(unordered_set, key=lambda x: x.m))
-		del unordered_set
-		collect()
+	@timing
+	def setNumbers(self, numbers: dict):
+		# numbers is a dict of number to is_special, their grids are computed
+		# in a single pass and used by addRationalSet for each of them
+		self.numbers_grids = {
+			n: ((numbers[n], self.counts_only, self.accumulate_only), grids) for n, grids in
+			compute_numbers_grids(
+				numbers, self.dim, self.T, self.max, self.session.processes, self.counts_only, self.accumulate_only,
+				self._pool()
+			).items()
+		}
 
 	def set_algorithm(self, algo):
 		self.algorithm = algo
 
+	def set_counts_only(self, counts_only):
+		# the numpy engine may then leave the times and next digits at zero
+		self.counts_only = counts_only
+
+	def set_accumulate_only(self, accumulate_only):
+		# only the accumulated spaces are computed and kept, the spaces of
+		# every time are left empty
+		if accumulate_only != self.accumulate_only:
+			self.accumulate_only = accumulate_only
+			self.spaces = Spaces(self.T, self.n, self.max, self.dim, self.dense, accumulate_only)
+			self.histograms = {}
+
+	def set_lazy(self, lazy):
+		# addRationalSet then leaves the slices to be computed when they are used
+		self.lazy = lazy
+
+	def has_pending_slices(self):
+		return self.grids is not None and (
+			len(self.grids) < self.max + 1 or len(self.accumulated) < 2
+		)
+
 	@timing
 	def addRationalSet(self, t=0, x=0, y=0, z=0):
 		self.spaces.clear()
+		self.grids = None
+		self.histograms = {}
 		print(f'algorithm: {self.algorithm}')
+		self.rationals = self.algorithm != 3
+		key = (self.is_special, self.counts_only, self.accumulate_only)
+		precomputed = self.numbers_grids.get(self.n, (None, None))[0] == key
 
 		if self.algorithm == 0:
-			for r in self.rationalSet:
-				add_rational2((self.spaces, self.is_special, self.T, self.max, r, t, x, y, z))
+			for r, k in orbit_members(self.n, self.dim, chunk_size):
+				add_member2((self.spaces, self.is_special, self.T, self.max, r, k, t, x, y, z))
 
 		elif self.algorithm == 1:
-			num_cpus = int(cpu_count() * 0.8)
-			chunksize = ((self.max * len(self.rationalSet)) // num_cpus) or 1
-			p = Pool(num_cpus)
-			params = []
-			for r in self.rationalSet:
-				for rt in range(self.max + 1):
-					params.append((r, rt, t, x, y, z))
-			results = p.imap(func=add_rational1, iterable=params, chunksize=chunksize)
-			p.close()
-			p.join()
-
-			for result in results:
-				pt, reminders, digits, m, next_digit, time, px, py, pz = result
-				self.spaces.add(self.is_special, pt, reminders, digits, m, next_digit, time, self.T, px, py, pz)
-				del result
-
-			del params
-			del results
+			num_cpus = self.session.processes
+			p = self.session.pool()
+			members = orbit_members(self.n, self.dim, chunk_size)
+			while True:
+				chunk = list(islice(members, chunk_size))
+				if not chunk:
+					break
+				step = -(-len(chunk) // (num_cpus * 4))
+				params = [(chunk[i:i+step], self.max, t, x, y, z) for i in range(0, len(chunk), step)]
+				for results in p.imap(func=add_members1, iterable=params):
+					for result in results:
+						pt, orbit, digits, m, next_digit, time, px, py, pz = result
+						self.spaces.add(self.is_special, pt, orbit, digits, m, next_digit, time, self.T, px, py, pz)
+					del results
 			collect()
 
 		elif self.algorithm == 2:
-			num_cpus = int(cpu_count() * 0.8)
-			chunksize = ((len(self.rationalSet)) // num_cpus) or 1
-			p = Pool(num_cpus)
-			params = []
-			for r in self.rationalSet:
-				params.append((self.spaces, self.is_special, self.T, self.max, r, t, x, y, z))
-
-			p.imap(func=add_rational2, iterable=params, chunksize=chunksize)
-			p.close()
-			p.join()
-
-			del params
+			num_cpus = self.session.processes
+			p = self.session.pool()
+			# the workers write into a copy held by the session manager
+			shared = self.session.manager().Spaces(
+				self.T, self.n, self.max, self.dim, self.dense, self.accumulate_only
+			)
+			for ms in orbit_chunks(self.n, self.dim, chunk_size):
+				params = [
+					(shared, self.is_special, self.T, self.max, chunk, self.n, self.dim, t, x, y, z)
+					for chunk in np.array_split(ms, num_cpus * 4)
+				]
+				for _ in p.imap_unordered(func=add_orbits2, iterable=params):
+					pass
+			for name in slice_names(self.max):
+				self.spaces.setColumns(name, shared.getColumns(name))
+			del shared
+			collect()
+
+		elif self.algorithm == 3 and self.lazy and not precomputed and not self.accumulate_only:
+			self.grids = {}
+			self.accumulated = set()
+
+		elif self.algorithm == 3:
+			if precomputed:
+				_, (grids, even, odd) = self.numbers_grids.pop(self.n)
+			else:
+				grids, even, odd = compute_grids(
+					self.n, self.dim, self.T, self.max, self.is_special, self.session.processes, self.counts_only,
+					self.accumulate_only, self._pool()
+				)
+			for grid in grids:
+				self.spaces.setCells(grid.t, *grid.occupied())
+			self.spaces.setCells(0, *even.occupied(), accumulate=True)
+			self.spaces.setCells(1, *odd.occupied(), accumulate=True)
+			del grids, even, odd
 			collect()
 
+		self._put_cache()
 		self.changed = False
 
 	def reset(self, T, num, max, dim):
-		self.__init__(T, num, max, dim)
+		self.__init__(T, num, max, dim, self.dense, self.session)
 		self.changed = True
 
-	@timing
-	def save(self, fname):
-		spaces = self.spaces.save()
-		output = {
+	def _header(self):
+		return {
 			'dim': self.dim,
 			'num': self.n,
 			'special': self.is_special,
 			'T': self.T,
 			'max': self.max,
-			'spaces': spaces
+			'rationals': self.rationals,
+			'counts_only': not self.has_times()
 		}
+
+	@timing
+	def save(self, fname):
+		self._computeAll()
+		if is_binary(fname):
+			with SpaceTimeWriter(fname, self._header()) as writer:
+				for name in slice_names(self.max):
+					writer.write_slice(name, self.spaces.getColumns(name))
+			return
+		spaces = self.spaces.save()
+		output = self._header()
+		output['format'] = version
+		output['spaces'] = spaces
 		with open(fname, 'wt') as fp:
 			json.dump(output, fp, indent=4)
 
 	@timing
 	def load(self, fname):
+		if is_binary(fname):
+			with SpaceTimeReader(fname) as reader:
+				header = reader.header
+				self.reset(header['T'], header['num'], header['max'], header['dim'])
+				self.is_special = header['special']
+				self.rationals = header.get('rationals', True)
+				self.counts_only = header.get('counts_only', False)
+				for name in slice_names(self.max):
+					self.spaces.setColumns(name, reader.read_slice(name))
+			return
 		with open(fname, 'rt') as fp:
-			input = json.load(fp)
+			input = upgrade_json(json.load(fp))
 		self.reset(input['T'], input['num'], input['max'], input['dim'])
 		self.is_special = input['special']
+		self.rationals = input.get('rationals', True)
+		self.counts_only = input.get('counts_only', False)
 		self.spaces.load(input['spaces'])
 
 
@@ -493,8 +891,10 @@ if __name__ == '__main__':
 	ws.cell(row=1, column=2, value='algo 0')
 	ws.cell(row=1, column=3, value='algo 1')
 	ws.cell(row=1, column=4, value='algo 2')
+	ws.cell(row=1, column=5, value='algo 3')
+	ws.cell(row=1, column=6, value='single pass')
 
-	for algorithm in range(3):
+	for algorithm in range(4):
 		spacetime.set_algorithm(algorithm)
 		row = 2
 		for n in divisors:
@@ -509,6 +909,14 @@ if __name__ == '__main__':
 			ws.cell(row=row, column=algorithm+2, value=duration)
 			row += 1
 
-	wb.save(fname)
-		
+	print('Set all the divisors in a single pass...')
+	spacetime.set_algorithm(3)
+	spacetime.setNumbers({n: True for n in divisors})
+	duration = get_last_duration()
+	for n in divisors:
+		spacetime.setRationalSet(n, is_special=True)
+		spacetime.addRationalSet()
+		duration += get_last_duration()
+	ws.cell(row=2, column=6, value=duration)
 
+	wb.save(fname)
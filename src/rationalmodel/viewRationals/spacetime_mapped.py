@@ -0,0 +1,120 @@
+import os
+import json
+import shutil
+from collections import OrderedDict
+import numpy as np
+
+from spacetime_file import SpaceTimeReader, slice_names, is_binary, columns_to_cells, version
+from cell_view import CellsView
+from config import config
+
+
+class MappedSpaceTime(object):
+	# read only spacetime over a memory mapped .spt file, slices are
+	# materialised on demand and the most recently viewed ones are kept
+	def __init__(self, fname, cache_size=0):
+		self.fname = fname
+		self.cache_size = cache_size or config.get('mapped_cache_slices')
+		self.reader = SpaceTimeReader(fname, mmap=True)
+		header = self.reader.header
+		self.T = header['T']
+		self.n = header['num']
+		self.max = header['max']
+		self.dim = header['dim']
+		self.is_special = header['special']
+		# the files written before the flag always have their rationals
+		self.rationals = header.get('rationals', True)
+		self.counts_only = header.get('counts_only', False)
+		self.slices = OrderedDict()
+		self.max_times = {}
+		self.histograms = {}
+
+	def __del__(self):
+		self.reader.close()
+
+	def __getstate__(self):
+		return {'fname': self.fname, 'cache_size': self.cache_size}
+
+	def __setstate__(self, state):
+		self.__init__(state['fname'], state['cache_size'])
+
+	def save(self, fname):
+		if is_binary(fname):
+			if not os.path.exists(fname) or not os.path.samefile(fname, self.fname):
+				shutil.copyfile(self.fname, fname)
+			return
+		output = {key: value for key, value in self.reader.header.items() if key != 'arrays'}
+		output['rationals'] = self.rationals
+		output['counts_only'] = self.counts_only
+		output['format'] = version
+		output['spaces'] = {
+			name: columns_to_cells(self.reader.read_slice(name), self.dim) for name in slice_names(self.max)
+		}
+		with open(fname, 'wt') as fp:
+			json.dump(output, fp, indent=4)
+
+	def getParams(self):
+		return self.T, self.n, self.max, self.dim, self.is_special
+
+	def has_rationals(self):
+		return self.rationals
+
+	def has_times(self):
+		return not self.counts_only
+
+	def len(self):
+		return self.max
+
+	@staticmethod
+	def _name(t, accumulate):
+		if not accumulate:
+			return str(t)
+		return 'accumulates_even' if t%2 == 0 else 'accumulates_odd'
+
+	def _slice(self, name):
+		if name in self.slices:
+			self.slices.move_to_end(name)
+			return self.slices[name]
+		cells = CellsView(
+			self.dim,
+			self.reader.read(f'{name}/pos'),
+			self.reader.read(f'{name}/count'),
+			self.reader.read(f'{name}/time'),
+			self.reader.read(f'{name}/next_digits')
+		)
+		indexes = dict(zip(map(tuple, cells.pos.tolist()), range(len(cells))))
+		self.slices[name] = (cells, indexes)
+		while len(self.slices) > self.cache_size:
+			self.slices.popitem(last=False)
+		return self.slices[name]
+
+	def getCell(self, t, x, y=0, z=0, accumulate=False):
+		cells, indexes = self._slice(self._name(t, accumulate))
+		index = indexes.get((x, y, z))
+		if index is None:
+			return None
+		return cells[index]
+
+	def getCells(self, t, accumulate=False):
+		cells, _ = self._slice(self._name(t, accumulate))
+		return cells
+
+	def getHistogram(self, t, accumulate=False):
+		name = self._name(t, accumulate)
+		if name not in self.histograms:
+			self.histograms[name] = np.unique(self.reader.read(f'{name}/count'), return_counts=True)
+		return self.histograms[name]
+
+	def getMaxTime(self, accumulate=False):
+		if accumulate not in self.max_times:
+			if not accumulate:
+				names = [str(t) for t in range(self.max + 1)]
+			else:
+				names = ['accumulates_even', 'accumulates_odd']
+			max_time = -1
+			for name in names:
+				time = self.reader.read(f'{name}/time')
+				if len(time) and time.max() > max_time:
+					max_time = float(time.max())
+			self.max_times[accumulate] = max_time
+		return self.max_times[accumulate]
@@ -0,0 +1,665 @@
+import math
+import numpy as np
+from multiprocessing import Pool
+
+
+# changes with any change in the results, the cached spacetimes of other versions are not used
+engine_version = 1
+chunk_size = 1 << 20
+no_numerator = np.iinfo(np.int64).max
+
+
+def positions(t, dim, index):
+	# half unit coordinates of the cells of the given indexes at time t
+	pos = np.zeros((len(index), 3), dtype=np.int64)
+	for axis in range(dim):
+		pos[:, axis] = t - 2 * ((index // (t + 1)**axis) % (t + 1))
+	return pos
+
+
+class SpaceGrid(object):
+	def __init__(self, t, dim):
+		self.t = t
+		self.dim = dim
+		self.base = 2**dim
+		self.size = (t + 1)**dim
+		self.count = np.zeros(self.size, dtype=np.int64)
+		self.time = np.zeros(self.size, dtype=np.float64)
+		self.next_digits = np.zeros((self.size, self.base), dtype=np.int64)
+		# first numerator that reached each cell, it gives the cells the same
+		# order the scalar algorithms create them in
+		self.first = np.full(self.size, no_numerator, dtype=np.int64)
+		# and the last one, the first of the reflected cell is n minus it
+		self.last = np.full(self.size, -1, dtype=np.int64)
+		self.pos = np.zeros((self.size, 3), dtype=np.int64)
+
+	def setPositions(self):
+		self.pos = positions(self.t, self.dim, np.arange(self.size, dtype=np.int64))
+
+	def add(self, index, m, time, next_digit):
+		self.count += np.bincount(index, minlength=self.size)
+		self.time += np.bincount(index, weights=time, minlength=self.size)
+		self.next_digits += np.bincount(index * self.base + next_digit, minlength=self.size * self.base).reshape(self.size, self.base)
+		new = self.first[index] == no_numerator
+		if new.any():
+			np.minimum.at(self.first, index[new], m[new])
+		np.maximum.at(self.last, index, m)
+
+	def merge(self, count, time, next_digits, first, last):
+		self.count += count
+		self.time += time
+		self.next_digits += next_digits
+		np.minimum(self.first, first, out=self.first)
+		np.maximum(self.last, last, out=self.last)
+
+	def merge_accumulated(self, count, time, next_digits, first, pos):
+		self.count += count
+		self.time += time
+		self.next_digits += next_digits
+		earlier = first < self.first
+		self.pos[earlier] = pos[earlier]
+		self.first[earlier] = first[earlier]
+
+	def mirror(self, n):
+		# adds the reflection of every cell, for odd n (n - m)/n has the
+		# complemented digits of m/n, so its ones of every axis at time t are
+		# t minus them
+		shape = (self.t + 1,) * self.dim
+		axes = tuple(range(self.dim))
+
+		def flip(a):
+			return np.flip(a.reshape(shape + a.shape[1:]), axis=axes).reshape(a.shape).copy()
+
+		count = flip(self.count)
+		time = flip(self.time)
+		next_digits = flip(self.next_digits)[:, ::-1]
+		first = flip(self.last)
+		last = flip(self.first)
+		first = np.where(first < 0, no_numerator, n - first)
+		last = np.where(last == no_numerator, -1, n - last)
+		self.merge(count, time, next_digits, first, last)
+
+	def occupied(self):
+		cells = np.flatnonzero(self.count)
+		cells = cells[np.argsort(self.first[cells], kind='stable')]
+		return self.pos[cells], self.count[cells], self.time[cells], self.next_digits[cells]
+
+
+def add_numerators(grids: list[SpaceGrid], n, dim, max, m0, m1):
+	add_multiples({n: grids}, n, dim, max, m0, m1)
+
+
+def add_multiples(numbers_grids: dict, L, dim, max, m0, m1, mirror=False):
+	# m/d is the rational (m*L/d)/L, so one pass over the numerators of L
+	# adds the numerators of every number d dividing it to its own grids,
+	# with mirror also d - m, whose digits are the complement of those of m
+	base = 2**dim
+	M = np.arange(m0, m1, dtype=np.int64)
+	r = M.copy()
+
+	selections = []
+	for d, grids in numbers_grids.items():
+		k = L // d
+		if k == 1:
+			selections.append((grids, slice(None), M, d))
+		else:
+			select = np.flatnonzero(M % k == 0)
+			selections.append((grids, select, M[select] // k, d))
+
+	def next_digit(r):
+		rb = r * base
+		# m == n never leaves reminder n and keeps emitting the digit base - 1
+		d = np.minimum(rb // L, base - 1)
+		return d, rb - d * L
+
+	ones = [np.zeros(len(M), dtype=np.int64) for _ in range(3)]
+	time = np.zeros(len(M), dtype=np.int64)
+	digit, r = next_digit(r)
+	following, r = next_digit(r)
+	for t in range(max + 1):
+		index = ones[0] + (t + 1) * (ones[1] + (t + 1) * ones[2])
+		if mirror:
+			reflected = sum((t - ones[axis]) * (t + 1)**axis for axis in range(dim))
+		for grids, select, m, d in selections:
+			grids[t].add(index[select], m, time[select], following[select])
+			if mirror:
+				grids[t].add(reflected[select], d - m, time[select], base - 1 - following[select])
+		for axis in range(dim):
+			ones[axis] += (digit >> axis) & 1
+		time += digit != following
+		digit = following
+		following, r = next_digit(r)
+
+
+def _slice_bits(L, dim, T, t, M):
+	# the digits of one period of M/L are those of M * (base^T - 1) / L, so
+	# the ones and the digit changes up to t are bit counts of masks of it
+	base = 2**dim
+	q, r = divmod(t, T)
+
+	def bits(a):
+		return np.bitwise_count(a).astype(np.int64)
+
+	u = M.astype(np.uint64) * np.uint64((base**T - 1) // L)
+	low = sum(1 << dim * j for j in range(T))
+	ones = [np.zeros(len(M), dtype=np.int64) for _ in range(3)]
+	for axis in range(dim):
+		mask = low << axis
+		ones[axis] = q * bits(u & mask) + bits((u >> dim * (T - r)) & mask)
+	rotated = ((u << dim) | (u >> dim * (T - 1))) & ((1 << dim * T) - 1)
+	changed = u ^ rotated
+	changes = changed
+	for bit in range(1, dim):
+		changes = changes | (changed >> bit)
+	changes = changes & low
+	time = q * bits(changes) + bits(changes >> dim * (T - r))
+	following = ((u >> dim * (T - 1 - (t + 1) % T)) & (base - 1)).astype(np.int64)
+	return ones, time, following
+
+
+def slice_digits(L, dim, T, t, M):
+	# ones of every axis in the first t digits of the numerators M of L, the
+	# number of digit changes among them and the digit t + 1
+	base = 2**dim
+	if hasattr(np, 'bitwise_count') and dim * T < 63 and (base**T - 1) % L == 0:
+		return _slice_bits(L, dim, T, t, M)
+
+	def next_digit(r):
+		rb = r * base
+		d = np.minimum(rb // L, base - 1)
+		return d, rb - d * L
+
+	ones = [np.zeros(len(M), dtype=np.int64) for _ in range(3)]
+	time = np.zeros(len(M), dtype=np.int64)
+	digit, r = next_digit(M.copy())
+	following, r = next_digit(r)
+	for _ in range(t):
+		for axis in range(dim):
+			ones[axis] += (digit >> axis) & 1
+		time += digit != following
+		digit = following
+		following, r = next_digit(r)
+	return ones, time, following
+
+
+def add_slice(grid: SpaceGrid, n, dim, T, m0, m1):
+	M = np.arange(m0, m1, dtype=np.int64)
+	ones, time, following = slice_digits(n, dim, T, grid.t, M)
+	index = ones[0] + (grid.t + 1) * (ones[1] + (grid.t + 1) * ones[2])
+	grid.add(index, M, time, following)
+
+
+def add_slice_chunk(args):
+	n, dim, T, t, m0, m1 = args
+	grid = SpaceGrid(t, dim)
+	for m in range(m0, m1, chunk_size):
+		add_slice(grid, n, dim, T, m, min(m + chunk_size, m1))
+	return grid.count, grid.time, grid.next_digits, grid.first, grid.last
+
+
+def _accumulate_index(t, S, dim, index=None):
+	if index is None:
+		index = np.arange((t + 1)**dim, dtype=np.int64)
+	v = np.zeros_like(index)
+	for axis in reversed(range(dim)):
+		ones = (index // (t + 1)**axis) % (t + 1)
+		v = v * (S + 1) + (S - t + 2 * ones)
+	# same truncation towards zero as cell_index in Space.getCell
+	return np.where(v >= 0, v // 2, -((-v) // 2))
+
+
+def accumulated_times(parity, T, max, is_special):
+	return [t for t in range(parity, max + 1, 2) if not (t < max - T and is_special)]
+
+
+def accumulate_size(parity, T, max):
+	return max if T%2 == parity else max-1
+
+
+def accumulate(grids: list[SpaceGrid], S, parity, dim, T, max, is_special):
+	acc = SpaceGrid(S, dim)
+	for t in accumulated_times(parity, T, max, is_special):
+		accumulate_grid(acc, grids[t], max, is_special)
+	return acc
+
+
+def accumulate_grid(acc: SpaceGrid, grid: SpaceGrid, max, is_special):
+	t = grid.t
+	cells = np.flatnonzero(grid.count)
+	if is_special:
+		cells = cells[(cells != 0) & (cells != grid.size - 1)]
+	index = _accumulate_index(t, acc.t, grid.dim)[cells]
+	valid = (index >= 0) & (index < acc.size)
+	cells = cells[valid]
+	index = index[valid]
+	np.add.at(acc.count, index, grid.count[cells])
+	np.add.at(acc.time, index, grid.time[cells])
+	np.add.at(acc.next_digits, index, grid.next_digits[cells])
+	# a cell keeps the position of the first rational that reached it, in (m, t) order
+	key = grid.first[cells] * (max + 1) + t
+	np.minimum.at(acc.first, index, key)
+	first = key == acc.first[index]
+	acc.pos[index[first]] = grid.pos[cells[first]]
+
+
+class AccumulatingGrid(object):
+	# stands for the grid of the time t in a pass over the numerators, what
+	# is added to it goes straight to the accumulated grid of its parity
+	def __init__(self, acc: SpaceGrid, t, max, is_special, included):
+		self.acc = acc
+		self.t = t
+		self.dim = acc.dim
+		self.size = (t + 1)**acc.dim
+		self.max = max
+		self.is_special = is_special
+		self.included = included
+
+	def add(self, index, m, time, next_digit):
+		if not self.included:
+			return
+		acc = self.acc
+		keep = np.ones(len(index), dtype=bool)
+		if self.is_special:
+			keep = (index != 0) & (index != self.size - 1)
+		acc_index = _accumulate_index(self.t, acc.t, self.dim, index)
+		keep &= (acc_index >= 0) & (acc_index < acc.size)
+		index = index[keep]
+		acc_index = acc_index[keep]
+		acc.count += np.bincount(acc_index, minlength=acc.size)
+		acc.time += np.bincount(acc_index, weights=time[keep], minlength=acc.size)
+		acc.next_digits += np.bincount(
+			acc_index * acc.base + next_digit[keep], minlength=acc.size * acc.base
+		).reshape(acc.size, acc.base)
+		key = m[keep] * (self.max + 1) + self.t
+		np.minimum.at(acc.first, acc_index, key)
+		first = key == acc.first[acc_index]
+		acc.pos[acc_index[first]] = positions(self.t, self.dim, index[first])
+
+
+def accumulating_grids(dim, T, max, is_special):
+	# the accumulated grids of both parities and a grid adding to them for every time
+	accs = [SpaceGrid(accumulate_size(parity, T, max), dim) for parity in range(2)]
+	times = set(accumulated_times(0, T, max, is_special) + accumulated_times(1, T, max, is_special))
+	grids = [AccumulatingGrid(accs[t % 2], t, max, is_special, t in times) for t in range(max + 1)]
+	return grids, accs
+
+
+def add_chunk(args):
+	# runs in a worker, the grids of the chunk are private to it and the
+	# parent merges them, so there is no shared state between workers
+	L, numbers, dim, T, max, m0, m1, accumulate_only = args
+	if accumulate_only:
+		numbers_accs = {d: accumulating_grids(dim, T, max, is_special) for d, is_special in numbers.items()}
+		numbers_grids = {d: grids for d, (grids, _) in numbers_accs.items()}
+	else:
+		numbers_grids = {d: [SpaceGrid(t, dim) for t in range(max + 1)] for d in numbers}
+	for m in range(m0, m1, chunk_size):
+		add_multiples(numbers_grids, L, dim, max, m, min(m + chunk_size, m1), accumulate_only and L % 2 == 1)
+	if accumulate_only:
+		return {
+			d: [(acc.count, acc.time, acc.next_digits, acc.first, acc.pos) for acc in accs]
+			for d, (_, accs) in numbers_accs.items()
+		}
+	return {
+		d: [(grid.count, grid.time, grid.next_digits, grid.first, grid.last) for grid in grids]
+		for d, grids in numbers_grids.items()
+	}
+
+
+def complete_period(n, dim):
+	# period T of a complete number n = (2^dim)^T - 1, or 0 for other numbers
+	base = 2**dim
+	T = 0
+	while base**T - 1 < n:
+		T += 1
+	return T if base**T - 1 == n and T > 0 else 0
+
+
+def _axis_counts(T, t, fixed={}):
+	# the bits of one axis of the digits of a complete number are every string
+	# of T bits once, this counts them by their ones in the first t bits of
+	# the periodic string, with some positions fixed to a bit, from the P ones
+	# of the first r = t % T bits and the Q ones of the rest of the period
+	q, r = divmod(t, T)
+	prefix = [bit for j, bit in fixed.items() if j < r]
+	suffix = [bit for j, bit in fixed.items() if j >= r]
+	w = [0] * (t + 1)
+	for P in range(sum(prefix), r - len(prefix) + sum(prefix) + 1):
+		ways = math.comb(r - len(prefix), P - sum(prefix))
+		for Q in range(sum(suffix), T - r - len(suffix) + sum(suffix) + 1):
+			w[q * (P + Q) + P] += ways * math.comb(T - r - len(suffix), Q - sum(suffix))
+	return np.array(w, dtype=np.int64)
+
+
+def _axis_first(T, t, base):
+	# smallest string of T bits for every number of ones in the first t bits,
+	# as a base number, the ones are at the end of the first r bits and of the
+	# rest of the period
+	q, r = divmod(t, T)
+	first = [no_numerator] * (t + 1)
+	for P in range(r + 1):
+		for Q in range(T - r + 1):
+			bits = list(range(r - P, r)) + list(range(T - Q, T))
+			u = sum(base**(T - 1 - j) for j in bits)
+			v = q * (P + Q) + P
+			first[v] = min(first[v], u)
+	return np.array(first, dtype=np.int64)
+
+
+def _outer(values: list):
+	# value of every cell of a grid, the product of the values of its axes
+	# for the ones of each axis, with the first axis varying fastest
+	out = values[0]
+	for axis_values in values[1:]:
+		out = np.multiply.outer(axis_values, out)
+	return out.ravel()
+
+
+def complete_grids(dim, T, max):
+	# grids of the complete number (2^dim)^T - 1 from the closed form counts,
+	# the axes are independent so every value is a product over the axes
+	return [complete_grid(dim, T, t) for t in range(max + 1)]
+
+
+def complete_grid(dim, T, t):
+	base = 2**dim
+	grid = SpaceGrid(t, dim)
+	grid.setPositions()
+	grid.count = _outer([_axis_counts(T, t)] * dim)
+	j = (t + 1) % T
+	bits = [_axis_counts(T, t, {j: bit}) for bit in range(2)]
+	for digit in range(base):
+		grid.next_digits[:, digit] = _outer([bits[(digit >> axis) & 1] for axis in range(dim)])
+	q, r = divmod(t, T)
+	for j in range(T):
+		changes = q + (1 if j < r else 0)
+		if changes == 0:
+			continue
+		equal = sum(_axis_counts(T, t, {j: bit, (j + 1) % T: bit}) for bit in range(2))
+		grid.time += changes * (grid.count - _outer([equal] * dim)).astype(np.float64)
+	first = _axis_first(T, t, base)
+	index = np.arange(grid.size, dtype=np.int64)
+	m = np.zeros(grid.size, dtype=np.int64)
+	for axis in range(dim):
+		m += (1 << axis) * first[(index // (t + 1)**axis) % (t + 1)]
+	grid.first = np.where(grid.count > 0, m, no_numerator)
+	return grid
+
+
+def divisor_cofactor(n, dim, T):
+	# k with n * k = (2^dim)^T - 1, or 0 when n does not divide it
+	N = (2**dim)**T - 1
+	return N // n if n and N % n == 0 else 0
+
+
+def _dp_strings(dim, T, r, k):
+	# counts and smallest value of the strings of T digits whose value is a
+	# multiple of k, by the ones of every axis in their first r digits (P)
+	# and in the rest of them (Q), built digit by digit over the states
+	# (value mod k, P, Q) with P and Q packed as mixed radix indexes
+	base = 2**dim
+	SP = (r + 1)**dim
+	SQ = (T - r + 1)**dim
+	count = np.zeros((k, SP, SQ), dtype=np.int64)
+	first = np.full((k, SP, SQ), no_numerator, dtype=np.int64)
+	count[0, 0, 0] = 1
+	first[0, 0, 0] = 0
+	for i in range(T):
+		new_count = np.zeros_like(count)
+		new_first = np.full_like(first, no_numerator)
+		for digit in range(base):
+			# base and k are coprime, so the map of the reminders is one to one
+			mod = (np.arange(k) * base + digit) % k
+			radix = r + 1 if i < r else T - r + 1
+			shift = sum(((digit >> axis) & 1) * radix**axis for axis in range(dim))
+			value = np.where(first == no_numerator, no_numerator, first * base + digit)
+			if i < r:
+				new_count[mod, shift:, :] += count[:, :SP - shift, :]
+				new_first[mod, shift:, :] = np.minimum(new_first[mod, shift:, :], value[:, :SP - shift, :])
+			else:
+				new_count[mod, :, shift:] += count[:, :, :SQ - shift]
+				new_first[mod, :, shift:] = np.minimum(new_first[mod, :, shift:], value[:, :, :SQ - shift])
+		count = new_count
+		first = new_first
+	return count[0], first[0]
+
+
+def dp_grids(n, dim, T, max):
+	# counts only grids of a divisor n of (2^dim)^T - 1, the numerators m of n
+	# are the strings of T digits with value m * k, k = (2^dim)^T - 1 / n,
+	# times and next digits are left at zero
+	return sorted(dp_slices(n, dim, T, range(max + 1)), key=lambda grid: grid.t)
+
+
+def dp_grid(n, dim, T, t):
+	return next(dp_slices(n, dim, T, [t]))
+
+
+def dp_slices(n, dim, T, times):
+	# the grids of the given times, the strings are counted once for all the
+	# times with the same t % T
+	k = divisor_cofactor(n, dim, T)
+	for r in sorted({t % T for t in times}):
+		strings = _dp_strings(dim, T, r, k)
+		for t in sorted(t for t in times if t % T == r):
+			grid = SpaceGrid(t, dim)
+			_dp_fill(grid, strings, T, k)
+			yield grid
+
+
+def _dp_fill(grid: SpaceGrid, strings, T, k):
+	count, first = strings
+	t = grid.t
+	q, r = divmod(t, T)
+	grid.setPositions()
+	P = np.arange(count.shape[0], dtype=np.int64)
+	Q = np.arange(count.shape[1], dtype=np.int64)
+	index = np.zeros((len(P), len(Q)), dtype=np.int64)
+	for axis in range(grid.dim):
+		p_axis = (P // (r + 1)**axis) % (r + 1)
+		q_axis = (Q // (T - r + 1)**axis) % (T - r + 1)
+		v = q * (p_axis[:, None] + q_axis[None, :]) + p_axis[:, None]
+		index += v * (t + 1)**axis
+	valid = count > 0
+	np.add.at(grid.count, index[valid], count[valid])
+	np.minimum.at(grid.first, index[valid], first[valid] // k)
+
+
+def use_dp(n, dim, T, max):
+	# the dynamic programming costs about T^2 * base * k * states operations,
+	# the enumeration about (n + 1) * (max + 1) times the operations of a step
+	k = divisor_cofactor(n, dim, T)
+	if not k:
+		return False
+	states = max_states = 0
+	for r in range(T):
+		states = (r + 1)**dim * (T - r + 1)**dim
+		max_states = states if states > max_states else max_states
+	return T * T * 2**dim * k * max_states < (n + 1) * (max + 1) * 16
+
+
+def number_batches(numbers: list):
+	# numbers computed together in a pass over the numerators of their lcm,
+	# a number joins a batch while that lcm is within the sum of the numbers
+	# of the batch, the numerators their separate passes would visit
+	batches = []
+	for d in sorted(numbers, reverse=True):
+		for batch in batches:
+			L = math.lcm(batch[0], d)
+			if L <= batch[1] + d:
+				batch[0] = L
+				batch[1] += d
+				batch[2].append(d)
+				break
+		else:
+			batches.append([d, d, [d]])
+	return [(L, batch) for L, _, batch in batches]
+
+
+def _imap(pool, processes, func, params):
+	# the tasks run on the given pool, or on a pool of their own
+	if pool is not None:
+		yield from pool.imap_unordered(func, params)
+		return
+	with Pool(processes) as p:
+		yield from p.imap_unordered(func, params)
+
+
+def compute_numbers_grids(
+	numbers: dict, dim, T, max, processes=1, counts_only=False, accumulate_only=False, pool=None
+):
+	# grids of every number in numbers, a dict of number to is_special,
+	# computed in a pass over the numerators of the lcm of every batch of
+	# them from number_batches, except for
+	# the complete numbers that come from their closed form and, when only
+	# the counts are needed, the divisors of (2^dim)^T - 1 with a small cofactor,
+	# with accumulate_only the grids of every time are not kept, everything
+	# goes straight to the accumulated grids
+	numbers_grids = {}
+	numbers_accs = {}
+	pending = []
+	for d, is_special in numbers.items():
+		times = range(max + 1)
+		if accumulate_only:
+			times = sorted(accumulated_times(0, T, max, is_special) + accumulated_times(1, T, max, is_special))
+		period = complete_period(d, dim)
+		if period:
+			slices = (complete_grid(dim, period, t) for t in times)
+		elif counts_only and use_dp(d, dim, T, max):
+			slices = dp_slices(d, dim, T, times)
+		elif accumulate_only:
+			pending.append(d)
+			numbers_grids[d], numbers_accs[d] = accumulating_grids(dim, T, max, is_special)
+			continue
+		else:
+			pending.append(d)
+			numbers_grids[d] = [SpaceGrid(t, dim) for t in range(max + 1)]
+			for grid in numbers_grids[d]:
+				grid.setPositions()
+			continue
+		if accumulate_only:
+			numbers_accs[d] = [SpaceGrid(accumulate_size(parity, T, max), dim) for parity in range(2)]
+			for grid in slices:
+				accumulate_grid(numbers_accs[d][grid.t % 2], grid, max, is_special)
+		else:
+			numbers_grids[d] = sorted(slices, key=lambda grid: grid.t)
+	# (L - M)/L has the complemented digits of M/L when L is odd, as then no
+	# M/L but 0 and 1 has two expansions, so only the numerators with 2M < L
+	# are visited and the grids are mirrored after, or the complemented
+	# numerators added with them when the grids are accumulated on the fly
+	for L, batch in number_batches(pending):
+		symmetric = L % 2 == 1
+		end = (L + 1) // 2 if symmetric else L + 1
+		if processes > 1 and end > chunk_size:
+			# every numerator takes the same work, so one chunk per worker
+			# balances the load, and every chunk is a set of grids to merge
+			num_chunks = processes
+			bounds = [end * i // num_chunks for i in range(num_chunks + 1)]
+			params = [
+				(L, {d: numbers[d] for d in batch}, dim, T, max, m0, m1, accumulate_only)
+				for m0, m1 in zip(bounds[:-1], bounds[1:]) if m0 < m1
+			]
+			for result in _imap(pool, processes, add_chunk, params):
+				for d, arrays in result.items():
+					if accumulate_only:
+						for acc, acc_arrays in zip(numbers_accs[d], arrays):
+							acc.merge_accumulated(*acc_arrays)
+						continue
+					for grid, grid_arrays in zip(numbers_grids[d], arrays):
+						grid.merge(*grid_arrays)
+		else:
+			batch_grids = {d: numbers_grids[d] for d in batch}
+			for m0 in range(0, end, chunk_size):
+				add_multiples(batch_grids, L, dim, max, m0, min(m0 + chunk_size, end), accumulate_only and symmetric)
+		if symmetric and not accumulate_only:
+			for d in batch:
+				for grid in numbers_grids[d]:
+					grid.mirror(d)
+	out = {}
+	for d, is_special in numbers.items():
+		if accumulate_only:
+			out[d] = ([], *numbers_accs[d])
+			continue
+		grids = numbers_grids[d]
+		even = accumulate(grids, accumulate_size(0, T, max), 0, dim, T, max, is_special)
+		odd  = accumulate(grids, accumulate_size(1, T, max), 1, dim, T, max, is_special)
+		out[d] = (grids, even, odd)
+	return out
+
+
+def compute_slice(n, dim, T, t, processes=1, counts_only=False, pool=None):
+	# grid of the time t alone, in a pass over the numerators that finds the
+	# digits up to t of each of them at once
+	period = complete_period(n, dim)
+	if period:
+		return complete_grid(dim, period, t)
+	if counts_only and use_dp(n, dim, T, 0):
+		return dp_grid(n, dim, T, t)
+	grid = SpaceGrid(t, dim)
+	grid.setPositions()
+	symmetric = n % 2 == 1
+	end = (n + 1) // 2 if symmetric else n + 1
+	if processes > 1 and end > chunk_size:
+		num_chunks = processes
+		bounds = [end * i // num_chunks for i in range(num_chunks + 1)]
+		params = [(n, dim, T, t, m0, m1) for m0, m1 in zip(bounds[:-1], bounds[1:]) if m0 < m1]
+		for arrays in _imap(pool, processes, add_slice_chunk, params):
+			grid.merge(*arrays)
+	else:
+		for m0 in range(0, end, chunk_size):
+			add_slice(grid, n, dim, T, m0, min(m0 + chunk_size, end))
+	if symmetric:
+		grid.mirror(n)
+	return grid
+
+
+def compute_grids(n, dim, T, max, is_special, processes=1, counts_only=False, accumulate_only=False, pool=None):
+	return compute_numbers_grids({n: is_special}, dim, T, max, processes, counts_only, accumulate_only, pool)[n]
+
+
+if __name__ == '__main__':
+	# timings only, test.py checks the results against the scalar algorithm
+	import time
+	print('------- complete numbers from the closed form against enumerating their numerators')
+	for dim, T, cycles in [(1, 1, 4), (1, 12, 3), (1, 20, 3), (2, 1, 4), (2, 6, 3), (2, 10, 3), (3, 2, 4), (3, 5, 3), (3, 7, 3)]:
+		n = (2**dim)**T - 1
+		max = T * cycles
+		init_time = time.perf_counter()
+		grids = complete_grids(dim, T, max)
+		closed_time = time.perf_counter() - init_time
+		init_time = time.perf_counter()
+		enumerated = [SpaceGrid(t, dim) for t in range(max + 1)]
+		for m0 in range(0, n + 1, chunk_size):
+			add_numerators(enumerated, n, dim, max, m0, min(m0 + chunk_size, n + 1))
+		enumerated_time = time.perf_counter() - init_time
+		print(f'dim {dim} T {T:2d} n {n:10d}: closed form {closed_time:8.3f} secs, enumerated {enumerated_time:8.3f} secs')
+
+	print('------- counts of divisors from the digit dynamic programming against enumerating their numerators')
+	for dim, T, cycles in [(1, 12, 3), (1, 20, 3), (2, 6, 3), (2, 10, 3), (3, 4, 3), (3, 7, 3)]:
+		N = (2**dim)**T - 1
+		max = T * cycles
+		for k in [3, 7, 11]:
+			if N % k:
+				continue
+			n = N // k
+			init_time = time.perf_counter()
+			grids = dp_grids(n, dim, T, max)
+			dp_time = time.perf_counter() - init_time
+			init_time = time.perf_counter()
+			enumerated = [SpaceGrid(t, dim) for t in range(max + 1)]
+			for m0 in range(0, n + 1, chunk_size):
+				add_numerators(enumerated, n, dim, max, m0, min(m0 + chunk_size, n + 1))
+			enumerated_time = time.perf_counter() - init_time
+			print(f'dim {dim} T {T:2d} n {n:10d} k {k:3d}: dp {dp_time:8.3f} secs, enumerated {enumerated_time:8.3f} secs')
+
+	print('------- single slices against all the slices of a pass over the numerators')
+	for dim, T, k in [(1, 20, 3), (2, 10, 11), (3, 7, 7), (3, 8, 7)]:
+		n = ((2**dim)**T - 1) // k
+		max = T * 3
+		init_time = time.perf_counter()
+		grids, _, _ = compute_grids(n, dim, T, max, False)
+		all_time = time.perf_counter() - init_time
+		init_time = time.perf_counter()
+		grid = compute_slice(n, dim, T, max)
+		slice_time = time.perf_counter() - init_time
+		print(f'dim {dim} T {T:2d} n {n:10d}: slice {slice_time:8.3f} secs, all the slices {all_time:8.3f} secs')
@@ -1,5 +1,6 @@
 import json
 import os
+import numpy as np
 from config import Config
 from openpyxl import Workbook
 from random import randint
@@ -184,6 +185,350 @@ def main5():
 
         print("Last value stored:", myclass.get())
 
+def test_histogram_selected():
+    from madcad import vec3
+    from PyQt5 import QtGui
+    from histogram import Scene
+
+    # the labels are drawn with a QPainter, which needs an application
+    app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+
+    # a selected bar is white, the same as the histogram widget draws it
+    scene = Scene(64, 32)
+    scene.add(10.0, 50.0, vec3(0.5, 0.25, 0.0), 10)
+    scene.add(20.0, 50.0, vec3(1, 1, 1), 20)
+    scene.add(30.0, 50.0, vec3(255, 255, 255), 30)
+    scene.fit()
+    image = scene.render()
+    assert image.width() == 64 and image.height() == 32
+    buffer = scene.buffer
+    for item, color in zip(scene.items, [(127, 63, 0), (255, 255, 255), (255, 255, 255)]):
+        x = scene.world2screen(item.x)
+        assert tuple(buffer[scene.height - 2, x, :3]) == color
+
+
+def test_scalar_orbits():
+    from rationals import Rational, orbit_members
+    from session import EngineSession
+    from spacetime_index import SpaceTime, Spaces
+
+    # algorithms 0 and 1 give the same spaces as adding a Rational per numerator
+    for dim, T, n, max, is_special in [(1, 4, 15, 8, False), (1, 6, 63, 9, True), (2, 3, 63, 6, False), (3, 2, 63, 4, True)]:
+        old = Spaces(T, n, max, dim, dense=True)
+        for m in range(n + 1):
+            r = Rational(m, n, dim)
+            orbit = min(r.reminders)
+            for rt in range(max + 1):
+                px, py, pz = r.position(rt)
+                old.add(is_special, rt, orbit, r.path(), m, r.digit(rt + 1), r.time(rt), T, px, py, pz)
+        for algorithm in (0, 1):
+            with EngineSession(2) as session:
+                spacetime = SpaceTime(T, n, max, dim, session=session)
+                spacetime.set_algorithm(algorithm)
+                spacetime.setRationalSet(n, is_special)
+                spacetime.addRationalSet()
+                assert spacetime.spaces.save() == old.save()
+
+    # orbit_members walks the orbits across chunks that split them
+    for dim, n in [(1, 63), (2, 45), (3, 511)]:
+        for size in (1, 7, n + 1):
+            members = list(orbit_members(n, dim, size))
+            assert len(members) == n + 1
+            for m, (r, k) in enumerate(members[:-1]):
+                assert r.reminder(k) == m and r.m == min(r.reminders)
+            assert members[-1][0].m == n
+
+
+def test_rationals_header():
+    import tempfile
+    from session import EngineSession
+    from spacetime_index import SpaceTime
+    from spacetime_mapped import MappedSpaceTime
+
+    # the files say when the numpy engine left the rationals of the cells out
+    with tempfile.TemporaryDirectory() as path, EngineSession(1) as session:
+        for algorithm, rationals in [(0, True), (3, False)]:
+            spacetime = SpaceTime(4, 15, 6, 1, session=session)
+            spacetime.set_algorithm(algorithm)
+            spacetime.setRationalSet(15)
+            spacetime.addRationalSet()
+            assert spacetime.has_rationals() == rationals
+            for fname in ['spacetime.json', 'spacetime.spt']:
+                fname = os.path.join(path, fname)
+                spacetime.save(fname)
+                loaded = SpaceTime(2, 2, 2, 1, session=session)
+                loaded.load(fname)
+                assert loaded.has_rationals() == rationals
+            mapped = MappedSpaceTime(fname)
+            assert mapped.has_rationals() == rationals
+            del mapped
+
+        # saved before the flag, with the rationals always computed
+        fname = os.path.join(path, 'spacetime.json')
+        with open(fname, 'rt') as fp:
+            content = json.load(fp)
+        del content['rationals']
+        with open(fname, 'wt') as fp:
+            json.dump(content, fp)
+        loaded = SpaceTime(2, 2, 2, 1, session=session)
+        loaded.load(fname)
+        assert loaded.has_rationals()
+
+
+def test_counts_only_header():
+    import tempfile
+    from session import EngineSession
+    from spacetime_index import SpaceTime
+    from spacetime_mapped import MappedSpaceTime
+
+    # the files say when the times and next digits were left out, the views
+    # of them are disabled when they are loaded
+    with tempfile.TemporaryDirectory() as path, EngineSession(1) as session:
+        for counts_only in (False, True):
+            spacetime = SpaceTime(6, 21, 13, 1, session=session)
+            spacetime.set_counts_only(counts_only)
+            spacetime.setRationalSet(21)
+            spacetime.addRationalSet()
+            assert spacetime.has_times() != counts_only
+            for fname in ['spacetime.json', 'spacetime.spt']:
+                fname = os.path.join(path, fname)
+                spacetime.save(fname)
+                loaded = SpaceTime(2, 2, 2, 1, session=session)
+                loaded.load(fname)
+                assert loaded.has_times() != counts_only
+            mapped = MappedSpaceTime(fname)
+            assert mapped.has_times() != counts_only
+            fname = os.path.join(path, 'mapped.json')
+            mapped.save(fname)
+            del mapped
+            loaded.load(fname)
+            assert loaded.has_times() != counts_only
+
+        # the scalar algorithms always compute the times
+        spacetime.set_algorithm(0)
+        spacetime.addRationalSet()
+        assert spacetime.has_times()
+
+
+def test_binary_round_trip():
+    import tempfile
+    import numpy as np
+    from session import EngineSession
+    from spacetime_index import SpaceTime
+    from spacetime_mapped import MappedSpaceTime
+    from spacetime_file import SpaceTimeReader, convert_json, slice_names, slice_columns
+
+    def check_columns(reader, spacetime, converted=False):
+        for name in slice_names(spacetime.max):
+            columns = reader.read_slice(name)
+            expected = spacetime.spaces.getColumns(name)
+            if converted:
+                # the json files key the rationals of a cell by their first numerator
+                expected['orbit'] = expected['m'][expected['m_offsets'][:-1]]
+            for column in slice_columns:
+                assert np.array_equal(columns[column], expected[column]), (name, column)
+
+    # the binary files and the json files converted to them keep every header
+    # value and the cells of every space
+    with tempfile.TemporaryDirectory() as path, EngineSession(1) as session:
+        for dim, T, n, max, algorithm in [(1, 4, 15, 6, 0), (2, 3, 63, 5, 0), (1, 6, 21, 9, 3)]:
+            spacetime = SpaceTime(T, n, max, dim, session=session)
+            spacetime.set_algorithm(algorithm)
+            spacetime.set_counts_only(algorithm == 3)
+            spacetime.setRationalSet(n, True)
+            spacetime.addRationalSet()
+            header = spacetime._header()
+            fname = os.path.join(path, 'spacetime.spt')
+            spacetime.save(fname)
+            with SpaceTimeReader(fname) as reader:
+                assert {key: reader.header[key] for key in header} == header
+                check_columns(reader, spacetime)
+
+            mapped = MappedSpaceTime(fname)
+            for t in range(max + 1):
+                for accumulate in (False, True):
+                    cells = mapped.getCells(t, accumulate)
+                    expected = spacetime.getCells(t, accumulate)
+                    for column in ['pos', 'count', 'time', 'next_digits']:
+                        assert np.array_equal(getattr(cells, column), getattr(expected, column))
+            json_name = os.path.join(path, 'spacetime.json')
+            mapped.save(json_name)
+            del mapped
+
+            converted = convert_json(json_name, os.path.join(path, 'converted.spt'))
+            with SpaceTimeReader(converted) as reader:
+                assert {key: reader.header[key] for key in header} == header
+                check_columns(reader, spacetime, converted=True)
+
+
+def _enumerated(n, dim, T, max, is_special):
+    from session import EngineSession
+    from spacetime_index import SpaceTime
+
+    # the spaces of the scalar algorithm, which adds every numerator one by one
+    with EngineSession(1) as session:
+        spacetime = SpaceTime(T, n, max, dim, session=session)
+        spacetime.set_algorithm(0)
+        spacetime.setRationalSet(n, is_special)
+        spacetime.addRationalSet()
+        return spacetime.spaces
+
+
+def _check_grid(grid, columns, counts_only=False):
+    # same cells in the same order
+    pos, count, time, next_digits = grid.occupied()
+    assert np.array_equal(pos[:, :grid.dim], columns['pos'])
+    assert np.array_equal(count, columns['count'])
+    if not counts_only:
+        assert np.array_equal(time, columns['time'])
+        assert np.array_equal(next_digits, columns['next_digits'])
+
+
+def _check_grids(grids, even, odd, spaces, counts_only=False):
+    # no grids of every time when only the accumulated ones are computed
+    assert not grids or [grid.t for grid in grids] == list(range(spaces.max + 1))
+    for grid in grids:
+        _check_grid(grid, spaces.getColumns(str(grid.t)), counts_only)
+    if even is not None:
+        _check_grid(even, spaces.getColumns('accumulates_even'), counts_only)
+        _check_grid(odd, spaces.getColumns('accumulates_odd'), counts_only)
+
+
+def test_complete_numbers():
+    from spacetime_numpy import complete_grids, complete_period, compute_grids
+
+    # the closed form of n = (2^dim)^T - 1 against enumerating its numerators
+    for dim, T, max in [(1, 1, 4), (1, 4, 9), (1, 5, 12), (2, 1, 4), (2, 3, 8), (2, 4, 9), (3, 2, 5), (3, 3, 7)]:
+        n = (2**dim)**T - 1
+        assert complete_period(n, dim) == T
+        for is_special in (False, True):
+            spaces = _enumerated(n, dim, T, max, is_special)
+            _check_grids(complete_grids(dim, T, max), None, None, spaces)
+            _check_grids(*compute_grids(n, dim, T, max, is_special), spaces)
+
+
+def test_digit_dp():
+    from spacetime_numpy import dp_grids, divisor_cofactor, use_dp, compute_grids
+
+    # the counts of the divisors of (2^dim)^T - 1 from the digit dynamic
+    # programming against enumerating their numerators
+    cases = [(1, 6, 21, 13), (1, 7, 127, 15), (1, 8, 85, 17), (1, 12, 1365, 12), (2, 3, 21, 7), (2, 3, 9, 8), (3, 2, 7, 5), (3, 3, 73, 7)]
+    assert any(use_dp(n, dim, T, max) for dim, T, n, max in cases)
+    for dim, T, n, max in cases:
+        assert divisor_cofactor(n, dim, T)
+        for is_special in (False, True):
+            spaces = _enumerated(n, dim, T, max, is_special)
+            _check_grids(dp_grids(n, dim, T, max), None, None, spaces, counts_only=True)
+            _check_grids(*compute_grids(n, dim, T, max, is_special, counts_only=True), spaces, counts_only=True)
+
+
+def test_mirror():
+    import spacetime_numpy
+    from spacetime_numpy import compute_grids, compute_numbers_grids, compute_slice, number_batches
+
+    # only m <= n/2 is visited and the grids are mirrored, or the accumulated
+    # grids get the mirrored numerators on the fly, in one process or split
+    # in chunks between the workers, with chunks small enough to be split
+    chunk_size = spacetime_numpy.chunk_size
+    spacetime_numpy.chunk_size = 2
+    try:
+        for dim, T, n, max in [(1, 4, 5, 9), (1, 5, 11, 11), (1, 6, 9, 13), (2, 3, 9, 7), (2, 4, 17, 8), (3, 2, 9, 5)]:
+            for is_special in (False, True):
+                spaces = _enumerated(n, dim, T, max, is_special)
+                for processes in (1, 2):
+                    _check_grids(*compute_grids(n, dim, T, max, is_special, processes), spaces)
+                    _, even, odd = compute_grids(n, dim, T, max, is_special, processes, accumulate_only=True)
+                    _check_grids([], even, odd, spaces)
+
+        # single slices, with the digits up to t of every numerator found at once
+        for dim, T, n, max in [(1, 6, 9, 13), (1, 6, 21, 13), (2, 3, 9, 7), (3, 2, 9, 5), (1, 4, 15, 9)]:
+            spaces = _enumerated(n, dim, T, max, False)
+            for t in range(max + 1):
+                for processes in (1, 2):
+                    _check_grid(compute_slice(n, dim, T, t, processes), spaces.getColumns(str(t)))
+
+        # several numbers in one pass over the numerators of their lcm
+        dim, T, max = 1, 6, 13
+        numbers = {9: True, 7: False, 21: True, 63: False}
+        assert number_batches(list(numbers)) == [(63, [63, 21, 9, 7])]
+        for processes in (1, 2):
+            for d, grids in compute_numbers_grids(numbers, dim, T, max, processes).items():
+                _check_grids(*grids, _enumerated(d, dim, T, max, numbers[d]))
+
+        # and in passes of their own when the lcm is larger than the numbers
+        dim, T, max = 1, 12, 13
+        numbers = {65: True, 63: False, 13: False, 45: True}
+        assert number_batches(list(numbers)) == [(65, [65, 13]), (63, [63]), (45, [45])]
+        for processes, accumulate_only in [(1, False), (1, True), (2, False), (2, True)]:
+            for d, grids in compute_numbers_grids(numbers, dim, T, max, processes, accumulate_only=accumulate_only).items():
+                _check_grids(*grids, _enumerated(d, dim, T, max, numbers[d]))
+    finally:
+        spacetime_numpy.chunk_size = chunk_size
+
+
+def test_lazy_slices():
+    from session import EngineSession
+    from spacetime_index import SpaceTime
+
+    # the slices left are computed by compute_pending, as an export needs
+    with EngineSession(2) as session:
+        spacetime = SpaceTime(4, 45, 9, 1, session=session)
+        spacetime.set_lazy(True)
+        spacetime.setRationalSet(45)
+        spacetime.addRationalSet()
+        assert spacetime.has_pending_slices()
+        spacetime.getCells(3)
+        assert spacetime.has_pending_slices()
+        spacetime.compute_pending()
+        assert not spacetime.has_pending_slices()
+        lazy = spacetime.spaces
+        spacetime = SpaceTime(4, 45, 9, 1, session=session)
+        spacetime.setRationalSet(45)
+        spacetime.addRationalSet()
+        assert lazy.save() == spacetime.spaces.save()
+
+
+def test_lazy_cache():
+    import tempfile
+    from session import EngineSession
+    from spacetime_index import SpaceTime
+    from spacetime_cache import SpaceTimeCache
+
+    # a lazy spacetime goes to the cache once its last slice left is computed
+    with tempfile.TemporaryDirectory() as path, EngineSession(1) as session:
+        cache = SpaceTimeCache(path, 2**30)
+        params = (1, 4, 45, 5, False)
+        spacetime = SpaceTime(4, 45, 5, 1, session=session)
+        spacetime.set_lazy(True)
+        spacetime.setRationalSet(45)
+        spacetime.set_cache(cache, params)
+        spacetime.addRationalSet()
+        for t in range(6):
+            assert not cache.get(*params)
+            spacetime.getCells(t)
+        spacetime.getCells(0, accumulate=True)
+        assert not cache.get(*params)
+        spacetime.getCells(1, accumulate=True)
+        assert cache.get(*params)
+
+        # and right away when it is computed whole
+        params = (1, 4, 63, 5, False)
+        spacetime.set_lazy(False)
+        spacetime.setRationalSet(63)
+        spacetime.set_cache(cache, params)
+        spacetime.addRationalSet()
+        assert cache.get(*params)
+
+
 if __name__ == '__main__':
     freeze_support()
-    main5()
+    test_histogram_selected()
+    test_scalar_orbits()
+    test_rationals_header()
+    test_counts_only_header()
+    test_binary_round_trip()
+    test_complete_numbers()
+    test_digit_dp()
+    test_mirror()
+    test_lazy_slices()
+    test_lazy_cache()
@@ -1,10 +1,9 @@
 import os
 import sys
 from time import time, sleep
-from multiprocessing import freeze_support, Manager
+from multiprocessing import freeze_support, cpu_count
 from threading import Thread
 from copy import deepcopy
-from multiprocessing import managers
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import Qt
@@ -16,6 +15,10 @@ from saveSpecials import SaveSpecialsWidget
 from saveVideo import SaveVideoWidget
 from saveImages import make_objects
 from spacetime_index import SpaceTime
+from spacetime_mapped import MappedSpaceTime
+from spacetime_file import is_binary
+from spacetime_cache import SpaceTimeCache
+from session import EngineSession, SessionManager
 from rationals import c
 from utils import getDivisorsAndFactors, divisors, make_video, collect
 from timing import timing, get_duration
@@ -28,10 +31,7 @@ from saveImages import _saveImages, _create_video
 settings_file = r'settings.txt'
 opengl_version = (3,3)
 
-class MyManager(managers.BaseManager):
-	...
-
-MyManager.register('SpaceTime', SpaceTime)
+SessionManager.register('SpaceTime', SpaceTime)
 
 
 class VideoThread(Thread):
@@ -47,9 +47,9 @@ class VideoThread(Thread):
     
     def run(self):
         self.parent.setStatus(f'Creating video sequence, please wait...')
-        self.processes = self.func_process(self.args_process)
-        self.processes[0].close()
-        self.processes[0].join()
+        self.processes = self.func_process(self.args_process, self.parent.session)
+        while not self.killed and not self.processes[0].ready():
+            self.processes[0].wait(0.5)
         if self.processes[1] and not self.killed and not self.single_image:
             self.func_video(self.processes[1])
             self.parent.setStatus(f'Video saved for number {int(self.parent.number.value()):d} in {get_duration():.2f} secs')
@@ -63,14 +63,12 @@ class VideoThread(Thread):
         collect()
 
     def kill(self):
-        if self.processes:
+        if self.processes and not self.killed:
             self.parent.setStatus('VIDEO CREATION CANCELLED...')
             self.killed = True
-            self.processes[0].terminate()
-            self.processes[0].close()
-            self.processes[0].join()
+            # the workers are restarted on the next use of the session
+            self.parent.session.terminate()
             self.parent.cancelVideo()
-            del self.processes
             collect()
             
 
@@ -97,9 +95,15 @@ class MainWindow(QtWidgets.QMainWindow):
         self.view_objects = True
         self.view_time = False
         self.view_next_number = False
-        self.manager = MyManager()
-        self.manager.start()
-        self.spacetime: SpaceTime = self.manager.SpaceTime(2, 2, 2, 1)
+        # the times and next digits of the computed number may be missing
+        self.counts_only = False
+        # and its spaces of every time, when only the accumulated ones are saved
+        self.accumulate_only = False
+        # workers and manager shared by the computations and the exports, the
+        # spacetime of the manager computes with the same pool
+        self.session = EngineSession(max(1, int(cpu_count() * 0.8)), shared=True)
+        self.spacetime: SpaceTime = self.session.manager().SpaceTime(2, 2, 2, 1, session=self.session)
+        self.computed_spacetime = self.spacetime
         self.video_thread = None
         self.factors = ''
         self.num = 0
@@ -107,6 +111,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.config = config
         self.color = None
         self.files_path = self.config.get('files_path')
+        self.cache = SpaceTimeCache(
+            os.path.join(self.files_path, 'cache'), self.config.get('cache_size_mb') * 2**20
+        )
         self.loadConfigColors()
         self._clear_parameters()
         self.showMaximized()
@@ -268,7 +275,13 @@ class MainWindow(QtWidgets.QMainWindow):
             end_frame = 6
             num_frames = 6
 
-        manager = Manager()
+        # the frames read the slices from the workers of the session, which
+        # would wait for the same workers to compute the slices left
+        if self.spacetime is self.computed_spacetime and self.spacetime.has_pending_slices():
+            self.setStatus('Computing the slices left...')
+            self.spacetime.compute_pending()
+
+        manager = self.session.manager()
         projection = self.views.views[self.views.mode].view.projection
         navigation = self.views.views[self.views.mode].view.navigation
         shr_projection = manager.Value(type(projection), projection)
@@ -417,23 +430,44 @@ class MainWindow(QtWidgets.QMainWindow):
         time1 = time()
 
         self.deselect_all()
+        self._set_times_view(True)
 
         n = int(self.number.value())
 
-        if self.changed_spacetime:
-            self.setStatus('Creating incremental spacetime...')
-            self.spacetime.reset(self.period.value(), n, self.maxTime.value(), dim=self.dim)
-            self.changed_spacetime = False
-            self.need_compute = False
-
-        self.spacetime.clear()
-
-        self.setStatus(f'Setting rational set for number: {n} ...')
-        self.spacetime.setRationalSet(n, self.is_special)
-
-        self.setStatus(f'Adding rational set for number: {n}...')
-        self.spacetime.addRationalSet()
-        self.setStatus(f'Rational set added for number {n}')
+        self.counts_only = not (self.view_time or self.view_next_number)
+        params = (
+            self.dim, self.period.value(), n, self.maxTime.value(), self.is_special, self.counts_only, self.accumulate_only
+        )
+        cache_name = self.cache.get(*params)
+        if cache_name:
+            self.setStatus(f'Loading number {n} from cache...')
+            self.spacetime = MappedSpaceTime(cache_name)
+        else:
+            if self.spacetime is not self.computed_spacetime:
+                self.spacetime = self.computed_spacetime
+                T, _, max, dim, _ = self.spacetime.getParams()
+                if (T, max, dim) != (self.period.value(), self.maxTime.value(), self.dim):
+                    self.changed_spacetime = True
+
+            if self.changed_spacetime:
+                self.setStatus('Creating incremental spacetime...')
+                self.spacetime.reset(self.period.value(), n, self.maxTime.value(), dim=self.dim)
+                self.changed_spacetime = False
+                self.need_compute = False
+
+            self.spacetime.clear()
+
+            self.setStatus(f'Setting rational set for number: {n} ...')
+            self.spacetime.set_counts_only(self.counts_only)
+            self.spacetime.set_accumulate_only(self.accumulate_only)
+            self.spacetime.set_lazy(self.config.get('lazy_slices'))
+            self.spacetime.setRationalSet(n, self.is_special)
+            # saved to the cache when computed, or else when the last slice left is
+            self.spacetime.set_cache(self.cache, params)
+
+            self.setStatus(f'Adding rational set for number: {n}...')
+            self.spacetime.addRationalSet()
+            self.setStatus(f'Rational set added for number {n}')
     
         self.timeWidget.setValue(self.maxTime.value() if self.period_changed else self.time.value())
         self.timeWidget.setFocus()
@@ -500,6 +534,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self.views.initialize(objs)
             if not self.histogram: 
                 self.histogram = Histogram(self, self.spacetime)
+            self.histogram.spacetime = self.spacetime
             self.histogram.set_number(int(self.number.value()))
             if self.view_histogram:
                 self.histogram.set_time(self._check_accumulate())
@@ -507,6 +542,7 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             print('continue setting number...')
             self.views.reset(objs)
+            self.histogram.spacetime = self.spacetime
             self.histogram.set_number(int(self.number.value()))
             if self.view_histogram:
                 self.histogram.set_time(self._check_accumulate())
@@ -685,25 +721,64 @@ class MainWindow(QtWidgets.QMainWindow):
         self.view_objects = False
         self.actionViewObjects.setChecked(self.view_objects)
         self.actionViewTime.setChecked(self.view_time)
-        self.draw_objects()
+        self._draw_or_compute()
 
     def update_view_next_number(self):
         self.view_next_number = not self.view_next_number
-        self.draw_objects()
+        self._draw_or_compute()
+
+    def _set_times_view(self, enabled):
+        # the times and next digits of a file saved with the counts only are not viewed
+        if not enabled:
+            self.view_time = False
+            self.view_next_number = False
+            self.actionViewTime.setChecked(False)
+            self.actionViewNextNumber.setChecked(False)
+        self.actionViewTime.setEnabled(enabled)
+        self.actionViewNextNumber.setEnabled(enabled)
+
+    def _draw_or_compute(self):
+        # a number computed for its counts only is computed again for the times and next digits
+        if self.counts_only and (self.view_time or self.view_next_number) and int(self.number.value()):
+            self.need_compute = True
+            self.compute()
+        else:
+            self.draw_objects()
 
     def saveSpecials(self):
         widget = SaveSpecialsWidget(self, self.period.value(), 61)
         widget.show()
 
+    def setNumbers(self, numbers: dict):
+        # the numbers not found in the cache are computed in a single pass,
+        # compute() then takes each of them from the computed spacetime
+        counts_only = not (self.view_time or self.view_next_number)
+        numbers = {
+            n: is_special for n, is_special in numbers.items()
+            if not self.cache.get(
+                self.dim, self.period.value(), n, self.maxTime.value(), is_special, counts_only, self.accumulate_only
+            )
+        }
+        if not numbers:
+            return
+        self.setStatus(f'Computing {len(numbers)} numbers in a single pass...')
+        self.spacetime = self.computed_spacetime
+        self.spacetime.reset(self.period.value(), 0, self.maxTime.value(), dim=self.dim)
+        self.changed_spacetime = False
+        self.spacetime.set_counts_only(counts_only)
+        self.spacetime.set_accumulate_only(self.accumulate_only)
+        self.spacetime.setNumbers(numbers)
+
     def saveSpecialNumbers(self, init_period, end_period, subfolder):
         self.accumulate.setChecked(True)
+        self.accumulate_only = True
         for period in range(init_period, end_period + 1, 2):
             if 46 <= period <= 48 and self.dim == 3:
                 continue
             self.period.setValue(period)
             self.changed_spacetime = True
+            numbers = {}
             for row in range(len(self.divisors)):
-                self.need_compute = True
                 item = self.divisors.item(row)
                 is_special = item.data(Qt.UserRole)
                 if not is_special:
@@ -711,6 +786,10 @@ class MainWindow(QtWidgets.QMainWindow):
                 number = int(item.text().split(' ', 1)[0])
                 if number > 1650000:
                     continue
+                numbers[number] = is_special
+            self.setNumbers(numbers)
+            for number, is_special in numbers.items():
+                self.need_compute = True
                 print(f'------ saving number {number}')
                 self.is_special = is_special
                 self.number.setValue(number)
@@ -718,6 +797,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.compute()
                 self.saveImage(subfolder=subfolder)
                 print(f'------ number {number} saved')
+        self.accumulate_only = False
         self.changed_spacetime = True
 
     def callSaveVideo(self):
@@ -735,9 +815,9 @@ class MainWindow(QtWidgets.QMainWindow):
         path  = os.path.join(files_path, self._getDimStr(), f'P{period:02d}')
         if not os.path.exists(path):
             os.makedirs(path)
-        file_name = os.path.join(path, f'{self._getDimStr()}_N{number:d}_P{period:02d}_F{factors}.json')
+        file_name = os.path.join(path, f'{self._getDimStr()}_N{number:d}_P{period:02d}_F{factors}.spt')
         out_name, _ = QtWidgets.QFileDialog.getSaveFileName(
-            self, 'Save number json file', file_name, '*.json'
+            self, 'Save number file', file_name, 'Spacetime files (*.spt);;Json files (*.json)'
         )
         if out_name:
             self.setStatus(f'Saving file: {os.path.basename(out_name)}...')
@@ -747,22 +827,28 @@ class MainWindow(QtWidgets.QMainWindow):
             self.files_path = os.path.dirname(out_name)
             app.restoreOverrideCursor()
             time2 = time()
-            self.setStatus(f'File {os.path.basename(out_name)} saved in {time2 - time1:0.2f} segs')
+            without = '' if self.spacetime.has_rationals() else ' without the rationals of the cells'
+            self.setStatus(f'File {os.path.basename(out_name)} saved{without} in {time2 - time1:0.2f} segs')
 
     def load(self):
         in_file_name, _ = QtWidgets.QFileDialog.getOpenFileName(
-            self, 'Open number json file', self.files_path, '*.json'
+            self, 'Open number file', self.files_path, 'Number files (*.spt *.json)'
         )
         if in_file_name:
             time1 = time()
             self.setStatus(f'Loading file {os.path.basename(in_file_name)}...')
             app.setOverrideCursor(QtCore.Qt.WaitCursor)
             self.files_path = os.path.dirname(in_file_name)
-            self.spacetime.load(in_file_name)
+            if is_binary(in_file_name):
+                self.spacetime = MappedSpaceTime(in_file_name)
+            else:
+                self.spacetime = self.computed_spacetime
+                self.spacetime.load(in_file_name)
             T, n, max, dim, is_special = self.spacetime.getParams()
             self.dim = dim
             spacetime = self.spacetime
             self._clear_parameters()
+            self._set_times_view(spacetime.has_times())
             self.spacetime = spacetime
             self.period.setValue(T)
             self.spacetime = spacetime
@@ -778,6 +864,12 @@ class MainWindow(QtWidgets.QMainWindow):
             time2 = time()
             self.setStatus(f'File {os.path.basename(in_file_name)} loaded in {time2 - time1:0.2f} segs')
 
+    def closeEvent(self, event):
+        self.cancelVideo()
+        self.computed_spacetime.shutdown()
+        self.session.shutdown()
+        super().closeEvent(event)
+
 
 if __name__=="__main__":
     freeze_support()
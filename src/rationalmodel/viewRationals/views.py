@@ -123,6 +123,12 @@ class View(QtWidgets.QWidget):
         self.update()
 
     def switch_display_id(self, id, state=None):
+        if isinstance(id, tuple):
+            # a cell drawn as an instance of a CellsDisplay
+            key, index = id
+            self.view.scene.displays[key].select(index, state)
+            self.view.update()
+            return
         if len(self.view.scene.item([0])) == 1:
             disp = self.view.scene.item([0])[0].displays[id]
         else: